@@ -3,7 +3,6 @@ import random
 import math
 import warnings
 from sys import maxsize
-import json
 import sys
 from functools import reduce
 
@@ -23,7 +22,8 @@ Advanced strategy tips:
 
   - The GameState.map object can be manually manipulated to create hypothetical 
   board states. Though, we recommended making a copy of the map to preserve 
-  the actual current map state.
+  the actual current map state. GameState.fork() makes a cheap copy of the
+  whole game state for this.
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
@@ -69,6 +69,9 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.setup_complete = False
         self.build_mask = []
         self.scored_on_locations = []
+        # on_action_frame only looks at breaches, so frames without one are skipped unparsed
+        self.subscribe_action_frames(["breach"])
+        self.frame_events = gamelib.EventDecoder(config)
         self.our_spawns = []
         self.our_locations = []
         self.our_placements = [[16, 2], [11, 2], [15, 1], [12, 1]]
@@ -327,15 +330,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         It gets the path the unit will take then checks locations on that path to 
         estimate the path's damage risk.
         """
-        damages = []
-        # Get the damage estimate each path will take
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
-            damage = 0
-            for path_location in path:
-                # Get number of enemy destructors that can attack the final location and multiply by destructor damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(DESTRUCTOR, game_state.config).damage_i
-            damages.append(damage)
+        # Get the damage estimate each path will take, the enemy firewalls are only scanned once for all of the paths
+        damages = [evaluation['damage'] for evaluation in game_state.evaluate_spawn_locations(location_options)]
         
         # Now just return the location that takes the least damage
         return location_options[damages.index(min(damages))]
@@ -345,17 +341,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         This function gives us a list of estimated damages taken when spawning a unit at each location, 
         the damages are ordered in the same order that locations are in location_options
         """
-        damages = []
-        # Get the damage estimate each path will take
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
-            damage = 0
-            for path_location in path:
-                # Get number of enemy destructors that can attack the final location and multiply by destructor damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(DESTRUCTOR, game_state.config).damage_i
-            damages.append(damage)
-        
-        return damages
+        # Get the damage estimate each path will take, the enemy firewalls are only scanned once for all of the paths
+        return [evaluation['damage'] for evaluation in game_state.evaluate_spawn_locations(location_options)]
 
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
         total_units = 0
@@ -381,17 +368,12 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at: https://docs.c1games.com/json-docs.html
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
-        for breach in breaches:
-            location = breach[0]
-            unit_owner_self = True if breach[4] == 1 else False
-            # When parsing the frame data directly, 
-            # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
-            if not unit_owner_self:
-                gamelib.debug_write("Got scored on at: {}".format(location))
-                self.scored_on_locations.append(location)
+        self.frame_events.decode(turn_string)
+        for breach in self.frame_events.breaches:
+            # Event records use player_index like the rest of gamelib, 0 is yourself and 1 is your opponent
+            if breach.player_index == 1:
+                gamelib.debug_write("Got scored on at: {}".format(breach.location))
+                self.scored_on_locations.append(breach.location)
                 gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
 
 
@@ -16,14 +16,18 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The EventDecoder class in events.py turns the events of action frames into typed records and totals them over each turn. 
+Investigating it is useful for players that want to model their opponent from the action phase. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
 from .algocore import AlgoCore
-from .util import debug_write
+from .util import debug_write, parse_message
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .events import EventDecoder
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "bitboard", "compact_map", "evaluator", "events", "fidelity", "game_state", "game_map", "geometry", "navigation", "scheduler", "simulator", "threat_map", "unit", "util"]
  
\ No newline at end of file
@@ -1,7 +1,109 @@
 import json
+import sys
+import threading
+import time
+import traceback
+from collections import deque
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .scheduler import TurnScheduler, get_turn_budget
+from .util import get_command, debug_write, BANNER_TEXT, send_command, ParsedMessage, get_message_type, has_events
+
+FRAME_POLICIES = ("block", "drop", "coalesce")
+
+
+class _MessageQueue(object):
+    """
+    A bounded queue of (message type, message) pairs passed from the reader thread to the strategy thread.
+    Turn, config and end messages always wait for room. When the queue is full, action frames are handled
+    by the frame policy: "block" waits like any other message, "drop" discards the new frame, and "coalesce"
+    replaces the newest queued frame with the new one. Frames are put with whether on_action_frame wants them,
+    and a wanted frame is never coalesced away by one that only precompute_next_turn wants.
+    """
+    def __init__(self, max_size, frame_policy):
+        self.max_size = max_size
+        self.frame_policy = frame_policy
+        self.skipped_frames = 0
+        self.__messages = deque()
+        self.__condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.__messages)
+
+    def put(self, message_type, message, wanted=True):
+        with self.__condition:
+            if message_type == 1 and len(self.__messages) >= self.max_size:
+                if self.frame_policy == "drop":
+                    self.skipped_frames += 1
+                    return
+                if self.frame_policy == "coalesce" and self.__messages[-1][0] == 1:
+                    # Replacing a frame the strategy wants with one it does not would lose its events
+                    if wanted or not self.__messages[-1][2]:
+                        self.__messages[-1] = (message_type, message, wanted)
+                    self.skipped_frames += 1
+                    return
+            while len(self.__messages) >= self.max_size:
+                self.__condition.wait()
+            self.__messages.append((message_type, message, wanted))
+            self.__condition.notify_all()
+
+    def get(self):
+        with self.__condition:
+            while not self.__messages:
+                self.__condition.wait()
+            message_type, message, _ = self.__messages.popleft()
+            self.__condition.notify_all()
+            return message_type, message
+
+
+class _Precomputer(object):
+    """
+    Runs a precomputation in a worker thread against the latest action frame it was given.
+    Frames given while the worker is busy replace each other, so only the newest one is computed next.
+    Each result is stored with the Zobrist hash of the board it was computed from.
+    """
+    def __init__(self, config, compute):
+        self.config = config
+        self.compute = compute
+        self.__frame = None
+        self.__busy = False
+        self.__result = None
+        self.__condition = threading.Condition()
+        worker = threading.Thread(target=self.__run, name="gamelib-precompute", daemon=True)
+        worker.start()
+
+    def submit(self, frame):
+        with self.__condition:
+            self.__frame = frame
+            self.__condition.notify_all()
+
+    def result(self, zobrist_hash, timeout=0):
+        with self.__condition:
+            self.__condition.wait_for(lambda: not self.__busy and self.__frame is None, timeout)
+            if self.__result is not None and self.__result[0] == zobrist_hash:
+                return self.__result[1]
+            return None
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__frame is not None)
+                frame = self.__frame
+                self.__frame = None
+                self.__busy = True
+            try:
+                game_state = GameState(self.config, frame)
+                zobrist_hash = game_state.get_zobrist_hash()
+                value = self.compute(game_state)
+                with self.__condition:
+                    self.__result = (zobrist_hash, value)
+            except Exception:
+                debug_write("Precomputation failed: {}".format(traceback.format_exc()))
+            finally:
+                with self.__condition:
+                    self.__busy = False
+                    self.__condition.notify_all()
+
 
 class AlgoCore(object):
     """
@@ -14,6 +116,96 @@ class AlgoCore(object):
     """
     def __init__(self):
         self.config = None
+        self._action_frame_events = None
+        self._reader_options = None
+        self._precomputer = None
+        self._turn_started_at = None
+
+    def subscribe_action_frames(self, event_types=None):
+        """Chooses which action frames are passed to on_action_frame.
+        Frames are checked with a quick scan of the message, and skipped frames are never parsed.
+        Algos that do not override on_action_frame never receive frames, whatever their subscription.
+
+        Args:
+            event_types: A list of event types, like ["breach", "death"]. Only frames holding at least one
+                of these events are passed to on_action_frame. None to receive every frame, which is the default
+        """
+        self._action_frame_events = None if event_types is None else list(event_types)
+
+    def use_reader_thread(self, max_queued_messages=64, frame_policy="coalesce"):
+        """Reads and parses messages from the game engine in a background thread.
+        The reader thread fills a bounded queue with messages it has already classified, and parsed if they will be read,
+        while the strategy runs on_turn and on_action_frame. Commands are still sent from the strategy thread with send_command.
+        Call this before start, for example in the __init__ of your AlgoStrategy.
+
+        Args:
+            max_queued_messages: How many messages can wait in the queue
+            frame_policy: What to do with a new action frame while the queue is full. "block" waits for room, "drop" skips
+                the new frame and "coalesce" replaces the newest queued frame with it, unless only precompute_next_turn wants
+                the new frame. Skipped frames are never passed to on_action_frame, so their events are lost, but every frame
+                holds the whole board. Frames that neither on_action_frame nor precompute_next_turn wants are never queued
+        """
+        if frame_policy not in FRAME_POLICIES:
+            raise ValueError("Frame policy {} is invalid. Frame policy should be one of {}.".format(frame_policy, FRAME_POLICIES))
+        if max_queued_messages < 1:
+            raise ValueError("At least one message must fit in the queue, got {}.".format(max_queued_messages))
+        self._reader_options = (max_queued_messages, frame_policy)
+
+    def get_turn_scheduler(self, safety_margin=0.5):
+        """Makes a TurnScheduler for the current turn, to run improvement steps and submit the best plan in time.
+        Its clock started when the turn message was read, and its budget is the soft time limit in the config.
+        Call it from on_turn.
+
+        Args:
+            safety_margin: How many seconds before the soft time limit the best plan is submitted
+
+        Returns:
+            A TurnScheduler
+        """
+        return TurnScheduler(get_turn_budget(self.config), safety_margin, self._turn_started_at)
+
+    def _wants_action_frame(self, message):
+        """
+        Checks if an action frame should be passed to on_action_frame
+        """
+        if type(self).on_action_frame is AlgoCore.on_action_frame:
+            return False
+        if self._action_frame_events is None:
+            return True
+        return any(has_events(message, event_type) for event_type in self._action_frame_events)
+
+    def precompute_next_turn(self, game_state):
+        """
+        Override this to precompute work for the next turn while the action phase plays out.
+        It runs in a worker thread against the latest action frame, and runs again whenever newer frames have arrived,
+        so by the end of the action phase it has seen a board close to the next turn's.
+        Return the results, such as paths, threat maps or build plans, and read them in on_turn with get_precomputed.
+        The game_state is built for this call alone, but self is shared with the strategy thread, so do not change
+        attributes that on_turn or on_action_frame use. Action frames are passed here whatever the frame subscription.
+        """
+        return None
+
+    def get_precomputed(self, game_state, timeout=0):
+        """Gets the result of precompute_next_turn if it was computed from the same board as game_state.
+        Boards are compared with GameState.get_zobrist_hash, which covers where the units are, their types, owners and
+        upgrades, but not their health. Reconcile anything else against game_state.
+
+        Args:
+            game_state: The game state to match, usually the one on_turn was called with
+            timeout: How many seconds to wait for a precomputation that is still running
+
+        Returns:
+            The value returned by precompute_next_turn, or None if nothing was computed from a matching board
+        """
+        if self._precomputer is None:
+            return None
+        return self._precomputer.result(game_state.get_zobrist_hash(), timeout)
+
+    def _wants_precompute(self):
+        """
+        Checks if precompute_next_turn has been overridden
+        """
+        return type(self).precompute_next_turn is not AlgoCore.precompute_next_turn
 
     def on_game_start(self, config):
         """
@@ -27,6 +219,7 @@ class AlgoCore(object):
         """
         This step function is called at the start of each turn.
         It is passed the current game state, which can be used to initiate a new GameState object. 
+        The game state is a ParsedMessage, a string that GameState and parse_message read without parsing it again.
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -39,7 +232,7 @@ class AlgoCore(object):
         After each deploy phase, the game engine will run the action phase of the round.
         The action phase is made up of a sequence of distinct frames. 
         Each of these frames is sent to the algo in order. 
-        They can be handled in this function. 
+        They can be handled in this function. Like on_turn, the frame is a ParsedMessage, use parse_message to read it.
         """
         pass
 
@@ -53,43 +246,110 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
+        if self._reader_options is not None:
+            self.__start_threaded(*self._reader_options)
+            return
+
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
             game_state_string = get_command()
-            if "replaySave" in game_state_string:
+            received_at = time.perf_counter()
+            # Messages are classified by scanning for their turnInfo, they are only parsed when they are read
+            if not self._handle_message(get_message_type(game_state_string), game_state_string, received_at):
+                break
+
+    def __start_threaded(self, max_queued_messages, frame_policy):
+        messages = _MessageQueue(max_queued_messages, frame_policy)
+        reader = threading.Thread(target=self.__read_messages, args=(messages,), name="gamelib-reader", daemon=True)
+        reader.start()
+        while True:
+            stateType, game_state_string = messages.get()
+            if game_state_string is None:
+                debug_write("Got EOF, parent game process must have died, exiting for cleanup")
+                exit()
+            if not self._handle_message(stateType, game_state_string, game_state_string.received_at):
+                break
+        if messages.skipped_frames:
+            debug_write("Skipped {} action frames while the strategy was busy".format(messages.skipped_frames))
+
+    def __read_messages(self, messages):
+        """
+        Runs in the reader thread, classifying messages and parsing the ones the strategy will read
+        """
+        while True:
+            try:
+                line = sys.stdin.readline()
+            except EOFError:
+                line = ""
+            if line == "":
+                messages.put(None, None)
+                return
+            received_at = time.perf_counter()
+            stateType = get_message_type(line)
+            wanted = stateType == 1 and self._wants_action_frame(line)
+            if stateType == 1 and not wanted and not self._wants_precompute():
+                # Nothing reads this frame, so it should not take the place of one that is read
+                continue
+            message = ParsedMessage(line)
+            message.received_at = received_at
+            if stateType == 0 or wanted:
+                message.data
+            messages.put(stateType, message, wanted or stateType != 1)
+            if stateType == 2:
+                return
+
+    def _handle_message(self, stateType, game_state_string, received_at=None):
+        """
+        Passes one message from the game engine to the strategy. Returns False once the game is over
+        """
+        if stateType is None and "replaySave" in game_state_string:
+            """
+            This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+            """
+            parsed_config = json.loads(game_state_string)
+            self.on_game_start(parsed_config)
+        elif stateType is not None:
+            if stateType == 0:
+                """
+                This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+                deploy phase. Printing is handled by the provided functions.
+                """
+                self._turn_started_at = received_at
+                self.on_turn(self.__as_parsed(game_state_string))
+            elif stateType == 1:
                 """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+                If stateType == 1, this game_state_string string represents a single frame of an action phase
                 """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents a single frame of an action phase
-                    """
+                wants_precompute = self._wants_precompute()
+                wants_action_frame = self._wants_action_frame(game_state_string)
+                if wants_precompute or wants_action_frame:
+                    game_state_string = self.__as_parsed(game_state_string)
+                if wants_precompute:
+                    if self._precomputer is None:
+                        self._precomputer = _Precomputer(self.config, self.precompute_next_turn)
+                    self._precomputer.submit(game_state_string)
+                if wants_action_frame:
                     self.on_action_frame(game_state_string)
-                elif stateType == 2:
-                    """
-                    This is the end game message. This means the game is over so break and finish the program.
-                    """
-                    debug_write("Got end state, game over. Stopping algo.")
-                    break
-                else:
-                    """
-                    Something is wrong? Received an incorrect or improperly formatted string.
-                    """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+            elif stateType == 2:
+                """
+                This is the end game message. This means the game is over so break and finish the program.
+                """
+                debug_write("Got end state, game over. Stopping algo.")
+                return False
             else:
                 """
                 Something is wrong? Received an incorrect or improperly formatted string.
                 """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+                debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+        else:
+            """
+            Something is wrong? Received an incorrect or improperly formatted string.
+            """
+            debug_write("Got unexpected string : {}".format(game_state_string))
+        return True
+
+    def __as_parsed(self, game_state_string):
+        if isinstance(game_state_string, ParsedMessage):
+            return game_state_string
+        return ParsedMessage(game_state_string)
@@ -0,0 +1,177 @@
+from .geometry import ARENA_SIZE, CELL_COUNT, CELL_INDICES, EDGES, location_to_index
+
+"""
+Bitboards store one bit per cell of the arena in a single python int, using the
+same cell indices as geometry.py (bit y * ARENA_SIZE + x is location [x, y]).
+Moving every bit one step in a direction is a single shift, so flood fills touch
+a whole row of cells at once instead of looping over locations.
+"""
+
+
+def _mask_of(indices):
+    mask = 0
+    for index in indices:
+        mask |= 1 << index
+    return mask
+
+
+IN_BOUNDS_MASK = _mask_of(CELL_INDICES)
+# Shifting left or right by one bit wraps between the ends of two rows, these remove the wrapped bits
+_NOT_LEFT_COLUMN = _mask_of(index for index in range(CELL_COUNT) if index % ARENA_SIZE != 0)
+_NOT_RIGHT_COLUMN = _mask_of(index for index in range(CELL_COUNT) if index % ARENA_SIZE != ARENA_SIZE - 1)
+# Indexed like GameMap edges, [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right
+EDGE_MASKS = [_mask_of(y * ARENA_SIZE + x for x, y in edge) for edge in EDGES]
+_GRID_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def location_mask(location):
+    """Gets the bit of a location
+
+    Args:
+        location: A map location
+
+    Returns:
+        A mask with only the bit of the location set, 0 if the location is outside of the arena
+
+    """
+    index = location_to_index(location)
+    return 0 if index is None else 1 << index
+
+
+def grid_to_mask(grid):
+    """Converts a grid of flags indexed by cell, like the blocked grid from navigation.get_blocked_grid, to a mask
+    """
+    return int(bytes(grid).translate(_GRID_TO_DIGITS)[::-1], 2) & IN_BOUNDS_MASK
+
+
+def mask_to_locations(mask):
+    """Lists the locations of every bit set in a mask, in cell index order
+    """
+    locations = []
+    while mask:
+        low_bit = mask & -mask
+        index = low_bit.bit_length() - 1
+        locations.append([index % ARENA_SIZE, index // ARENA_SIZE])
+        mask ^= low_bit
+    return locations
+
+
+def count(mask):
+    """Counts the cells in a mask
+    """
+    return bin(mask).count("1")
+
+
+def expand(mask, open_mask):
+    """Grows a mask by one step in every direction, keeping only cells in open_mask
+    """
+    grown = (mask | ((mask << 1) & _NOT_LEFT_COLUMN) | ((mask >> 1) & _NOT_RIGHT_COLUMN)
+             | (mask << ARENA_SIZE) | (mask >> ARENA_SIZE))
+    return grown & open_mask
+
+
+def flood_fill(seed_mask, open_mask):
+    """Finds every cell of open_mask connected to the seed cells
+
+    Args:
+        * seed_mask: The cells to start filling from. Seeds outside of open_mask are ignored
+        * open_mask: The cells the fill can move through
+
+    Returns:
+        A mask of every reachable cell
+
+    """
+    filled = seed_mask & open_mask
+    while True:
+        grown = expand(filled, open_mask)
+        if grown == filled:
+            return filled
+        filled = grown
+
+
+class Bitboard:
+    """A bitboard view of which cells of the arena are pathable
+
+    Attributes :
+        * blocked_mask (int): The cells holding a stationary unit
+        * open_mask (int): The in bounds cells units can walk through
+
+    """
+    def __init__(self, blocked_mask=0):
+        self.blocked_mask = blocked_mask & IN_BOUNDS_MASK
+        self.open_mask = IN_BOUNDS_MASK & ~self.blocked_mask
+
+    @classmethod
+    def from_grid(cls, blocked):
+        """Builds a bitboard from a blocked grid, like the one returned by navigation.get_blocked_grid
+        """
+        return cls(grid_to_mask(blocked))
+
+    def set_blocked(self, location, blocked=True):
+        """Blocks or unblocks a single location
+        """
+        bit = location_mask(location)
+        if blocked:
+            self.blocked_mask |= bit
+        else:
+            self.blocked_mask &= ~bit
+        self.open_mask = IN_BOUNDS_MASK & ~self.blocked_mask
+
+    def with_blocked(self, location, blocked=True):
+        """Returns a new bitboard with a single location blocked or unblocked, leaving this one unchanged
+        """
+        bitboard = Bitboard(self.blocked_mask)
+        bitboard.set_blocked(location, blocked)
+        return bitboard
+
+    def pocket(self, location):
+        """Gets the pocket of pathable space around a location
+
+        Args:
+            location: A map location
+
+        Returns:
+            A mask of every cell a unit at location could walk to, 0 if the location is blocked
+
+        """
+        return flood_fill(location_mask(location), self.open_mask)
+
+    def can_reach_edge(self, location, target_edge):
+        """Checks if a unit at location could walk to the given edge
+
+        Args:
+            * location: The location of a hypothetical unit
+            * target_edge: game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            True if any open cell of the edge is in the location's pocket
+
+        """
+        edge_mask = EDGE_MASKS[target_edge] & self.open_mask
+        if not edge_mask:
+            return False
+        seed = location_mask(location) & self.open_mask
+        if not seed:
+            return False
+        filled = seed
+        while not filled & edge_mask:
+            grown = expand(filled, self.open_mask)
+            if grown == filled:
+                return False
+            filled = grown
+        return True
+
+    def pockets(self):
+        """Splits the pathable space into its separate pockets
+
+        Returns:
+            A list of masks, one for every connected pocket of open cells
+
+        """
+        pockets = []
+        remaining = self.open_mask
+        while remaining:
+            pocket = flood_fill(remaining & -remaining, remaining)
+            pockets.append(pocket)
+            remaining &= ~pocket
+        return pockets
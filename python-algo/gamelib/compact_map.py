@@ -0,0 +1,198 @@
+from array import array
+
+from .unit import GameUnit, get_unit_stats
+from .game_map import GameMap
+from .geometry import ARENA_SIZE, CELL_COUNT, location_to_index
+
+_EMPTY = 255
+_BLOCKED_TABLE = bytes(0 if type_index == _EMPTY else 1 for type_index in range(256))
+
+
+class CompactGameMap(GameMap):
+    """A GameMap that stores the board in flat arrays instead of GameUnit objects
+
+    Every location holds at most one stationary unit, so stationary units are stored as one
+    entry per cell index (y * ARENA_SIZE + x) in typed arrays. Mobile units are kept in a
+    separate dict from cell index to a list of (type index, player index, health) tuples.
+    GameUnit objects are only created when a location is indexed, so parsing a turn and
+    copying the board are cheap. A copy duplicates the arrays instead of sharing locations.
+
+    game_map[x, y] returns a new list of new GameUnits every time it is called.
+    Changing these units does not change the map, use add_unit, remove_unit, upgrade_unit,
+    set_pending_removal or item assignment to edit the board instead.
+
+    Attributes :
+        * unit_type (bytearray): The index in unitInformation of the stationary unit at each cell, 255 if there is none
+        * owner (bytearray): The player index owning the stationary unit at each cell
+        * health (array): The health of the stationary unit at each cell
+        * upgraded (bytearray): 1 if the stationary unit at a cell is upgraded
+        * pending_removal (bytearray): 1 if the stationary unit at a cell is being removed by its owner
+        * mobile_units (dict): Maps cell indices to lists of (type index, player index, health) tuples
+
+    """
+    def __init__(self, config):
+        """Initializes constants and an empty board
+
+        Args:
+            config (JSON): Contains information about the game
+
+        """
+        self.__stationary_types = set()
+        for type_index, unit_information in enumerate(config["unitInformation"]):
+            if unit_information.get("unitCategory") == 0:
+                self.__stationary_types.add(type_index)
+        super().__init__(config)
+
+    def _reset_cells(self):
+        self.unit_type = bytearray([_EMPTY]) * CELL_COUNT
+        self.owner = bytearray(CELL_COUNT)
+        self.health = array('d', bytes(8 * CELL_COUNT))
+        self.upgraded = bytearray(CELL_COUNT)
+        self.pending_removal = bytearray(CELL_COUNT)
+        self.mobile_units = {}
+
+    def _copy_cells(self, game_map):
+        game_map.unit_type = self.unit_type[:]
+        game_map.owner = self.owner[:]
+        game_map.health = self.health[:]
+        game_map.upgraded = self.upgraded[:]
+        game_map.pending_removal = self.pending_removal[:]
+        game_map.mobile_units = {index: list(units) for index, units in self.mobile_units.items()}
+
+    def _cell_state(self, x, y):
+        index = y * ARENA_SIZE + x
+        return (self.unit_type[index], self.owner[index], self.health[index], self.upgraded[index],
+                self.pending_removal[index], tuple(self.mobile_units.get(index, ())))
+
+    def _restore_cell(self, x, y, state):
+        index = y * ARENA_SIZE + x
+        type_index, owner, health, upgraded, pending_removal, mobile_units = state
+        stationary = self.unit_type[index] != _EMPTY or type_index != _EMPTY
+        self.__clear(index)
+        if type_index != _EMPTY:
+            self.__set_stationary(index, type_index, owner, health, upgraded)
+            self.pending_removal[index] = pending_removal
+        for mobile_type_index, player_index, mobile_health in mobile_units:
+            self.__add_mobile(index, mobile_type_index, player_index, mobile_health)
+        if stationary:
+            self._stationary_changed([x, y])
+
+    def __getitem__(self, location):
+        if len(location) == 2 and self.in_arena_bounds(location):
+            return self.__get_units(location_to_index(location))
+        self._invalid_coordinates(location)
+
+    def __setitem__(self, location, val):
+        if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
+            index = location_to_index(location)
+            self._record(location[0], location[1])
+            self.__clear(index)
+            for unit in val:
+                if unit.stationary:
+                    self.__set_stationary(index, self._type_indices[unit.unit_type], unit.player_index, unit.health, unit.upgraded)
+                    self.pending_removal[index] = unit.pending_removal
+                else:
+                    self.__add_mobile(index, self._type_indices[unit.unit_type], unit.player_index, unit.health)
+            self._stationary_changed(location)
+            return
+        self._invalid_coordinates(location)
+
+    def __get_units(self, index):
+        x, y = index % ARENA_SIZE, index // ARENA_SIZE
+        unit_information = self.config["unitInformation"]
+        units = []
+        type_index = self.unit_type[index]
+        if type_index != _EMPTY:
+            unit = GameUnit(unit_information[type_index]["shorthand"], self.config, self.owner[index], self.health[index], x, y)
+            if self.upgraded[index]:
+                unit.upgrade()
+            unit.pending_removal = self.pending_removal[index] == 1
+            units.append(unit)
+        for type_index, player_index, health in self.mobile_units.get(index, ()):
+            units.append(GameUnit(unit_information[type_index]["shorthand"], self.config, player_index, health, x, y))
+        return units
+
+    def __clear(self, index):
+        if self.unit_type[index] != _EMPTY:
+            self._hash_stationary(index, self.unit_type[index], self.owner[index], self.upgraded[index])
+        for type_index, player_index, _ in self.mobile_units.get(index, ()):
+            self._hash_mobile(index, type_index, player_index, -1)
+        self.unit_type[index] = _EMPTY
+        self.owner[index] = 0
+        self.health[index] = 0
+        self.upgraded[index] = 0
+        self.pending_removal[index] = 0
+        self.mobile_units.pop(index, None)
+
+    def __set_stationary(self, index, type_index, player_index, health, upgraded=False):
+        self.unit_type[index] = type_index
+        self.owner[index] = player_index
+        self.health[index] = health if health else self.config["unitInformation"][type_index].get("startHealth", 0)
+        self.upgraded[index] = upgraded
+        self._hash_stationary(index, type_index, player_index, upgraded)
+
+    def __add_mobile(self, index, type_index, player_index, health):
+        health = health if health else self.config["unitInformation"][type_index].get("startHealth", 0)
+        self.mobile_units.setdefault(index, []).append((type_index, player_index, health))
+        self._hash_mobile(index, type_index, player_index, 1)
+
+    def add_unit(self, unit_type, location, player_index=0, health=None):
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+        if player_index < 0 or player_index > 1:
+            self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
+
+        index = location_to_index(location)
+        self._record(location[0], location[1])
+        type_index = self._type_indices[unit_type]
+        if type_index in self.__stationary_types:
+            self.__clear(index)
+            self.__set_stationary(index, type_index, player_index, health)
+            self._stationary_changed(location)
+        else:
+            self.__add_mobile(index, type_index, player_index, health)
+
+    def upgrade_unit(self, location):
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+
+        index = location_to_index(location)
+        if self.unit_type[index] != _EMPTY:
+            self._record(location[0], location[1])
+            self._hash_stationary(index, self.unit_type[index], self.owner[index], self.upgraded[index])
+            self.upgraded[index] = 1
+            self._hash_stationary(index, self.unit_type[index], self.owner[index], 1)
+            self._stationary_changed(location)
+            return self.__get_units(index)[0]
+
+    def set_pending_removal(self, location, pending_removal=True):
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+
+        index = location_to_index(location)
+        if self.unit_type[index] != _EMPTY:
+            self._record(location[0], location[1])
+            self.pending_removal[index] = pending_removal
+
+    def remove_unit(self, location):
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+
+        index = location_to_index(location)
+        stationary = self.unit_type[index] != _EMPTY
+        self._record(location[0], location[1])
+        self.__clear(index)
+        if stationary:
+            self._stationary_changed(location)
+
+    def get_blocked_grid(self):
+        return bytearray(self.unit_type.translate(_BLOCKED_TABLE))
+
+    def _stationary_stats(self, index):
+        type_index = self.unit_type[index]
+        if type_index == _EMPTY:
+            return None
+        unit_type = self.config["unitInformation"][type_index]["shorthand"]
+        return self.owner[index], get_unit_stats(self.config, unit_type, self.upgraded[index] == 1)
@@ -0,0 +1,153 @@
+"""
+Evaluates many spawn locations in parallel, with worker processes that live for the whole game.
+
+The board a worker needs is published once per turn into a block of shared memory, as flat arrays
+indexed by cell index: the blocked grid, then the damage per frame each player's firewalls deal to
+information units. Workers read the arrays directly, so a GameState is never pickled, and they keep
+their navigation fields until a new board is published.
+"""
+import atexit
+import multiprocessing
+from array import array
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+from .geometry import CELL_COUNT, EDGES, HALF_ARENA, TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT, location_to_index
+from .navigation import NavigationField, get_blocked_grid
+
+_DAMAGE_OFFSET = CELL_COUNT
+_BOARD_SIZE = _DAMAGE_OFFSET + 2 * CELL_COUNT * 8
+
+"""
+The result of evaluating one spawn location, the same values GameState.evaluate_spawn_locations returns.
+end_location is the last location of the path, which is on the target edge unless the unit self destructs.
+"""
+SpawnEvaluation = namedtuple("SpawnEvaluation", ["path_length", "damage", "end_location"])
+
+
+def _target_edge(x, y):
+    """
+    The edge a unit spawned at [x, y] paths towards, like GameState.get_target_edge
+    """
+    if x < HALF_ARENA:
+        return TOP_RIGHT if y < HALF_ARENA else BOTTOM_RIGHT
+    return TOP_LEFT if y < HALF_ARENA else BOTTOM_LEFT
+
+
+# The state of a worker process, set up by _init_worker
+_worker = {}
+
+
+def _init_worker(board_name):
+    board = shared_memory.SharedMemory(name=board_name)
+    _worker["board"] = board
+    _worker["damage"] = board.buf[_DAMAGE_OFFSET:_BOARD_SIZE].cast("d")
+    _worker["version"] = None
+
+
+def _evaluate_slice(task):
+    version, player_index, locations = task
+    if _worker["version"] != version:
+        _worker["blocked"] = bytearray(_worker["board"].buf[:CELL_COUNT])
+        _worker["fields"] = {}
+        _worker["version"] = version
+    blocked = _worker["blocked"]
+    fields = _worker["fields"]
+    threat_offset = (1 - player_index) * CELL_COUNT
+    damage_table = _worker["damage"]
+    results = []
+    for location in locations:
+        index = location_to_index(location)
+        if index is None or blocked[index]:
+            results.append(None)
+            continue
+        edge = _target_edge(location[0], location[1])
+        field = fields.get(edge)
+        if field is None:
+            field = fields[edge] = NavigationField(blocked, [list(end_point) for end_point in EDGES[edge]])
+        path = field.get_path(location)
+        damage = 0
+        for path_location in path:
+            damage += damage_table[threat_offset + location_to_index(path_location)]
+        results.append(SpawnEvaluation(len(path) - 1, damage, tuple(path[-1])))
+    return results
+
+
+class EvaluationPool:
+    """A pool of worker processes that evaluate spawn locations against a shared board
+
+    Create it once, for example in on_game_start, since starting processes costs more than a turn of evaluations.
+    Each turn, publish the game state and then evaluate as many locations as needed. The locations are split into
+    one slice per worker, and each worker returns compact SpawnEvaluation tuples.
+
+    Attributes :
+        * processes (int): The number of worker processes
+        * version (int): How many boards have been published
+
+    """
+    def __init__(self, processes=None):
+        """Starts the worker processes and allocates the shared board
+
+        Args:
+            processes: The number of worker processes, the number of CPUs if None
+
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.version = 0
+        self._board = shared_memory.SharedMemory(create=True, size=_BOARD_SIZE)
+        self._damage = self._board.buf[_DAMAGE_OFFSET:_BOARD_SIZE].cast("d")
+        self._published_hash = None
+        self._pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self._board.name,))
+        atexit.register(self.close)
+
+    def publish(self, game_state):
+        """Copies the board of a game state into shared memory, for the evaluations that follow.
+        Publishing the same board twice does nothing.
+
+        Args:
+            game_state: The game state to evaluate spawns on
+
+        """
+        zobrist_hash = game_state.get_zobrist_hash()
+        if self.version and zobrist_hash == self._published_hash:
+            return
+        walker_damage = game_state.get_threat_map().walker_damage
+        self._board.buf[:CELL_COUNT] = get_blocked_grid(game_state.game_map)
+        self._damage[:CELL_COUNT] = array("d", walker_damage[0])
+        self._damage[CELL_COUNT:] = array("d", walker_damage[1])
+        self._published_hash = zobrist_hash
+        self.version += 1
+
+    def evaluate_spawn_locations(self, locations, player_index=0):
+        """Gets the path length and damage of a unit spawned at each location, on the last published board
+
+        Args:
+            locations: A list of locations to evaluate
+            player_index: The player controlling the hypothetical units, 0 for you 1 for the enemy
+
+        Returns:
+            A list in the same order as locations, of SpawnEvaluations or None for blocked locations
+
+        """
+        if self.version == 0:
+            raise RuntimeError("Publish a game state before evaluating spawn locations.")
+        slice_size = -(-len(locations) // self.processes)
+        tasks = [(self.version, player_index, locations[start:start + slice_size])
+                 for start in range(0, len(locations), slice_size or 1)]
+        results = []
+        for slice_results in self._pool.map(_evaluate_slice, tasks):
+            results.extend(slice_results)
+        return results
+
+    def close(self):
+        """Stops the workers and frees the shared board. Called automatically when the algo exits
+        """
+        if self._pool is None:
+            return
+        self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+        self._damage.release()
+        self._board.close()
+        self._board.unlink()
+        atexit.unregister(self.close)
@@ -0,0 +1,307 @@
+"""
+Typed records for the events of action frames. In the raw frames every event is a list read
+with magic indices, and players are numbered 1 for you and 2 for your opponent. The records
+below name every field and use player_index 0 for you and 1 for your opponent, like the rest of gamelib.
+Full doc on format of a game frame at: https://docs.c1games.com/json-docs.html
+"""
+from .geometry import CELL_COUNT, location_to_index
+from .util import parse_message
+
+
+class SpawnEvent:
+    """A unit was created
+
+    Attributes :
+        * location ([int, int]): Where the unit was created
+        * unit_type (string): The type of the unit
+        * unit_id (string): The id of the unit
+        * player_index (int): The player owning the unit
+    """
+    __slots__ = ("location", "unit_type", "unit_id", "player_index")
+
+
+class MoveEvent:
+    """A mobile unit moved one step
+
+    Attributes :
+        * from_location ([int, int]): Where the unit moved from
+        * location ([int, int]): Where the unit moved to
+        * unit_type (string): The type of the unit
+        * unit_id (string): The id of the unit
+        * player_index (int): The player owning the unit
+    """
+    __slots__ = ("from_location", "location", "unit_type", "unit_id", "player_index")
+
+
+class DamageEvent:
+    """A unit took damage
+
+    Attributes :
+        * location ([int, int]): Where the damaged unit is
+        * damage (float): The damage taken
+        * unit_type (string): The type of the damaged unit
+        * unit_id (string): The id of the damaged unit
+        * player_index (int): The player owning the damaged unit
+    """
+    __slots__ = ("location", "damage", "unit_type", "unit_id", "player_index")
+
+
+class DeathEvent:
+    """A unit was destroyed
+
+    Attributes :
+        * location ([int, int]): Where the unit was
+        * unit_type (string): The type of the unit
+        * unit_id (string): The id of the unit
+        * player_index (int): The player owning the unit
+        * removed_by_owner (bool): True if the unit was removed by its owner instead of being destroyed
+    """
+    __slots__ = ("location", "unit_type", "unit_id", "player_index", "removed_by_owner")
+
+
+class InteractionEvent:
+    """A unit attacked or shielded another unit
+
+    Attributes :
+        * from_location ([int, int]): Where the attacking or shielding unit is
+        * location ([int, int]): Where the target is
+        * amount (float): The damage dealt or shield given
+        * unit_type (string): The type of the attacking or shielding unit
+        * from_id (string): The id of the attacking or shielding unit
+        * to_id (string): The id of the target
+        * player_index (int): The player owning the attacking or shielding unit
+    """
+    __slots__ = ("from_location", "location", "amount", "unit_type", "from_id", "to_id", "player_index")
+
+
+class BreachEvent:
+    """A mobile unit reached an enemy edge
+
+    Attributes :
+        * location ([int, int]): Where the unit scored
+        * damage (float): The damage dealt to the enemy player
+        * unit_type (string): The type of the unit
+        * unit_id (string): The id of the unit
+        * player_index (int): The player owning the unit, so 1 means your opponent scored on you
+    """
+    __slots__ = ("location", "damage", "unit_type", "unit_id", "player_index")
+
+
+class SelfDestructEvent:
+    """A mobile unit that could not move any further self destructed
+
+    Attributes :
+        * location ([int, int]): Where the unit self destructed
+        * targets (list): The locations of the units that were hit
+        * damage (float): The damage dealt to each target
+        * unit_type (string): The type of the unit
+        * unit_id (string): The id of the unit
+        * player_index (int): The player owning the unit
+    """
+    __slots__ = ("location", "targets", "damage", "unit_type", "unit_id", "player_index")
+
+
+class EventBuffer:
+    """A list of event records of one type, whose records are reused from frame to frame
+
+    It can be iterated, indexed and measured with len like a list. The records are overwritten
+    when the next frame is decoded, so copy any values that need to be kept for longer.
+    """
+    def __init__(self, record_class):
+        self._record_class = record_class
+        self._records = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        records = self._records
+        for index in range(self._count):
+            yield records[index]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("event index out of range")
+        return self._records[index]
+
+    def _clear(self):
+        self._count = 0
+
+    def _next_record(self):
+        if self._count == len(self._records):
+            self._records.append(self._record_class())
+        record = self._records[self._count]
+        self._count += 1
+        return record
+
+
+class EventDecoder:
+    """Decodes the events of action frames into typed records, and totals them over each turn
+
+    Call decode with every action frame, for example from on_action_frame. The per frame buffers hold the
+    events of the last decoded frame. The per turn totals are indexed by [player_index][cell index], where
+    player_index is the player owning the units, and are reset when a frame of a new turn is decoded.
+
+    Attributes :
+        * turn_number (int): The turn of the last decoded frame
+        * frame_number (int): The number of the last decoded frame within its turn
+        * spawns (EventBuffer): SpawnEvents of the last frame
+        * moves (EventBuffer): MoveEvents of the last frame
+        * damages (EventBuffer): DamageEvents of the last frame
+        * deaths (EventBuffer): DeathEvents of the last frame
+        * shields (EventBuffer): InteractionEvents for the shields of the last frame
+        * attacks (EventBuffer): InteractionEvents for the attacks of the last frame
+        * breaches (EventBuffer): BreachEvents of the last frame
+        * self_destructs (EventBuffer): SelfDestructEvents of the last frame
+        * breach_count (list): The number of each player's units that scored from each location this turn
+        * breach_damage (list): The damage each player's units dealt by scoring from each location this turn
+        * damage_taken (list): The damage each player's units took at each location this turn
+        * units_lost (list): For each player, a dict of unit type to the number of units destroyed this turn, not counting removals
+
+    """
+    def __init__(self, config):
+        """Sets up empty buffers
+
+        Args:
+            config (JSON): Contains information about the game, used to name unit types
+
+        """
+        self.unit_types = [unit_information.get("shorthand") for unit_information in config["unitInformation"]]
+        self.turn_number = -1
+        self.frame_number = -1
+        self.spawns = EventBuffer(SpawnEvent)
+        self.moves = EventBuffer(MoveEvent)
+        self.damages = EventBuffer(DamageEvent)
+        self.deaths = EventBuffer(DeathEvent)
+        self.shields = EventBuffer(InteractionEvent)
+        self.attacks = EventBuffer(InteractionEvent)
+        self.breaches = EventBuffer(BreachEvent)
+        self.self_destructs = EventBuffer(SelfDestructEvent)
+        self.reset_turn()
+
+    def reset_turn(self):
+        """Clears the per turn totals
+        """
+        self.breach_count = [[0] * CELL_COUNT, [0] * CELL_COUNT]
+        self.breach_damage = [[0] * CELL_COUNT, [0] * CELL_COUNT]
+        self.damage_taken = [[0] * CELL_COUNT, [0] * CELL_COUNT]
+        self.units_lost = [{}, {}]
+
+    def decode(self, frame):
+        """Decodes the events of an action frame
+
+        Args:
+            frame: An action frame, as a string, a ParsedMessage or a parsed dict
+
+        """
+        frame = parse_message(frame)
+        turn_info = frame.get("turnInfo", [1, self.turn_number, self.frame_number])
+        if turn_info[1] != self.turn_number:
+            self.reset_turn()
+        self.turn_number = turn_info[1]
+        self.frame_number = turn_info[2]
+
+        events = frame.get("events", {})
+        unit_types = self.unit_types
+        self.__decode_spawns(events.get("spawn", ()), unit_types)
+        self.__decode_moves(events.get("move", ()), unit_types)
+        self.__decode_damages(events.get("damage", ()), unit_types)
+        self.__decode_deaths(events.get("death", ()), unit_types)
+        self.__decode_interactions(self.shields, events.get("shield", ()), unit_types)
+        self.__decode_interactions(self.attacks, events.get("attack", ()), unit_types)
+        self.__decode_breaches(events.get("breach", ()), unit_types)
+        self.__decode_self_destructs(events.get("selfDestruct", ()), unit_types)
+
+    def _unit_type(self, type_index, unit_types):
+        return unit_types[type_index] if 0 <= type_index < len(unit_types) else type_index
+
+    def __decode_spawns(self, events, unit_types):
+        buffer = self.spawns
+        buffer._clear()
+        for location, type_index, unit_id, player in events:
+            record = buffer._next_record()
+            record.location = location
+            record.unit_type = self._unit_type(type_index, unit_types)
+            record.unit_id = unit_id
+            record.player_index = player - 1
+
+    def __decode_moves(self, events, unit_types):
+        buffer = self.moves
+        buffer._clear()
+        for from_location, location, _, type_index, unit_id, player in events:
+            record = buffer._next_record()
+            record.from_location = from_location
+            record.location = location
+            record.unit_type = self._unit_type(type_index, unit_types)
+            record.unit_id = unit_id
+            record.player_index = player - 1
+
+    def __decode_damages(self, events, unit_types):
+        buffer = self.damages
+        buffer._clear()
+        for location, damage, type_index, unit_id, player in events:
+            record = buffer._next_record()
+            record.location = location
+            record.damage = damage
+            record.unit_type = self._unit_type(type_index, unit_types)
+            record.unit_id = unit_id
+            record.player_index = player - 1
+            index = location_to_index(location)
+            if index is not None:
+                self.damage_taken[player - 1][index] += damage
+
+    def __decode_deaths(self, events, unit_types):
+        buffer = self.deaths
+        buffer._clear()
+        for location, type_index, unit_id, player, removed_by_owner in events:
+            record = buffer._next_record()
+            record.location = location
+            record.unit_type = self._unit_type(type_index, unit_types)
+            record.unit_id = unit_id
+            record.player_index = player - 1
+            record.removed_by_owner = bool(removed_by_owner)
+            if not removed_by_owner:
+                units_lost = self.units_lost[player - 1]
+                units_lost[record.unit_type] = units_lost.get(record.unit_type, 0) + 1
+
+    def __decode_interactions(self, buffer, events, unit_types):
+        buffer._clear()
+        for from_location, location, amount, type_index, from_id, to_id, player in events:
+            record = buffer._next_record()
+            record.from_location = from_location
+            record.location = location
+            record.amount = amount
+            record.unit_type = self._unit_type(type_index, unit_types)
+            record.from_id = from_id
+            record.to_id = to_id
+            record.player_index = player - 1
+
+    def __decode_breaches(self, events, unit_types):
+        buffer = self.breaches
+        buffer._clear()
+        for location, damage, type_index, unit_id, player in events:
+            record = buffer._next_record()
+            record.location = location
+            record.damage = damage
+            record.unit_type = self._unit_type(type_index, unit_types)
+            record.unit_id = unit_id
+            record.player_index = player - 1
+            index = location_to_index(location)
+            if index is not None:
+                self.breach_count[player - 1][index] += 1
+                self.breach_damage[player - 1][index] += damage
+
+    def __decode_self_destructs(self, events, unit_types):
+        buffer = self.self_destructs
+        buffer._clear()
+        for location, targets, damage, type_index, unit_id, player in events:
+            record = buffer._next_record()
+            record.location = location
+            record.targets = targets
+            record.damage = damage
+            record.unit_type = self._unit_type(type_index, unit_types)
+            record.unit_id = unit_id
+            record.player_index = player - 1
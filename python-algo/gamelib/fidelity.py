@@ -0,0 +1,271 @@
+"""
+Measures how closely ActionSimulator follows the game engine, by replaying recorded games.
+
+Replays are the .replay files of the game engine: the config followed by one JSON frame per line,
+the same lines get_results.Replay.load_data reads. Each replay is streamed one line at a time.
+At frame 0 of every action phase, a GameState is built from the frame, the recorded spawn events of
+information units become the deploys of an ActionSimulator, and every later frame of the turn is compared
+with one step of the simulator. Only action frames are parsed, other lines are skipped by their type.
+
+Divergences are counted per rule, and the rule that broke first in a turn is counted separately,
+since everything after a first divergence tends to diverge too. Check a folder of replays with:
+
+    python -m gamelib.fidelity replays/
+
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import traceback
+
+from .events import EventDecoder
+from .game_state import GameState
+from .geometry import CELL_X, CELL_Y, location_to_index
+from .simulator import ActionSimulator
+from .util import get_message_type
+
+"""
+The rules compared on every frame.
+movement: information units alive in both are at the same location.
+health: units alive in both have the same health, within HEALTH_TOLERANCE.
+deaths: the same information units and firewalls are alive.
+breaches: each player scored the same number of times during the frame.
+player_health: both players have the same health.
+"""
+RULES = ("movement", "health", "deaths", "breaches", "player_health")
+HEALTH_TOLERANCE = 0.01
+
+
+class FidelityStats:
+    """Divergence counts of the simulator against recorded frames
+
+    Attributes :
+        * replays (int): The number of replays checked
+        * errors (int): The number of replays that could not be read
+        * turns (int): The number of action phases simulated
+        * frames (int): The number of recorded frames compared
+        * divergences (dict): Maps each rule to the number of frames that broke it
+        * first_divergences (dict): Maps each rule to the number of turns that broke it first
+        * clean_turns (int): The number of turns that matched on every frame
+
+    """
+    def __init__(self):
+        self.replays = 0
+        self.errors = 0
+        self.turns = 0
+        self.frames = 0
+        self.divergences = dict.fromkeys(RULES, 0)
+        self.first_divergences = dict.fromkeys(RULES, 0)
+        self.clean_turns = 0
+
+    def merge(self, other):
+        """Adds the counts of another FidelityStats to these
+
+        Args:
+            other: The FidelityStats to add
+        """
+        self.replays += other.replays
+        self.errors += other.errors
+        self.turns += other.turns
+        self.frames += other.frames
+        self.clean_turns += other.clean_turns
+        for rule in RULES:
+            self.divergences[rule] += other.divergences[rule]
+            self.first_divergences[rule] += other.first_divergences[rule]
+
+    def summary(self):
+        """Formats the counts as a table
+
+        Returns:
+            A string with one line per rule
+        """
+        lines = ["{} replays ({} unreadable), {} turns, {} frames, {} turns matched every frame".format(
+            self.replays, self.errors, self.turns, self.frames, self.clean_turns)]
+        lines.append("{:>14} {:>10} {:>8} {:>12}".format("rule", "frames", "rate", "first in"))
+        for rule in RULES:
+            rate = self.divergences[rule] / self.frames if self.frames else 0
+            lines.append("{:>14} {:>10} {:>8.2%} {:>12}".format(rule, self.divergences[rule], rate, self.first_divergences[rule]))
+        return "\n".join(lines)
+
+
+class _TurnCheck:
+    """
+    Simulates one action phase from its frame 0 and compares it with the recorded frames that follow
+    """
+    def __init__(self, config, frame, decoder, categories, stats):
+        self.stats = stats
+        self.categories = categories
+        self.diverged = False
+        state = GameState(config, frame)
+        state.suppress_warnings(True)
+        decoder.decode(frame)
+        deploys = [[], []]
+        spawned_ids = [[], []]
+        for spawn in decoder.spawns:
+            if categories.get(spawn.unit_type) == 1:
+                deploys[spawn.player_index].append((spawn.unit_type, spawn.location[0], spawn.location[1]))
+                spawned_ids[spawn.player_index].append(spawn.unit_id)
+        self.simulator = ActionSimulator(state, [], [])
+        self.ids = {}
+        for player_index in (0, 1):
+            for (unit_type, x, y), unit_id in zip(deploys[player_index], spawned_ids[player_index]):
+                unit = self.simulator.spawn(unit_type, [x, y], player_index)
+                if unit is not None:
+                    self.ids[unit] = unit_id
+        stats.turns += 1
+
+    def compare(self, frame, decoder):
+        simulator = self.simulator
+        breaches = list(simulator.breaches)
+        frame_number = frame["turnInfo"][2]
+        while simulator.frame < frame_number:
+            simulator.step()
+        decoder.decode(frame)
+
+        recorded_mobile = {}
+        recorded_stationary = {}
+        for player_index, key in enumerate(("p1Units", "p2Units")):
+            for unit_type, units in zip(decoder.unit_types, frame[key]):
+                category = self.categories.get(unit_type)
+                for unit in units:
+                    x, y, health = int(unit[0]), int(unit[1]), float(unit[2])
+                    if category == 1:
+                        recorded_mobile[unit[3]] = (x, y, health)
+                    elif category == 0:
+                        recorded_stationary[location_to_index([x, y])] = health
+
+        broken = set()
+        simulated_mobile = {self.ids[unit]: unit for unit in simulator.mobile_units if unit in self.ids}
+        if set(simulated_mobile) != set(recorded_mobile):
+            broken.add("deaths")
+        for unit_id, unit in simulated_mobile.items():
+            recorded = recorded_mobile.get(unit_id)
+            if recorded is None:
+                continue
+            if (CELL_X[unit.index], CELL_Y[unit.index]) != recorded[:2]:
+                broken.add("movement")
+            if abs(unit.health - recorded[2]) > HEALTH_TOLERANCE:
+                broken.add("health")
+
+        alive = {unit.index: unit for unit in simulator.stationary_units if unit.alive}
+        if set(alive) != set(recorded_stationary):
+            broken.add("deaths")
+        for index, health in recorded_stationary.items():
+            unit = alive.get(index)
+            if unit is not None and abs(unit.health - health) > HEALTH_TOLERANCE:
+                broken.add("health")
+
+        recorded_breaches = [0, 0]
+        for breach in decoder.breaches:
+            recorded_breaches[breach.player_index] += 1
+        if [simulator.breaches[0] - breaches[0], simulator.breaches[1] - breaches[1]] != recorded_breaches:
+            broken.add("breaches")
+        recorded_health = [float(frame["p1Stats"][0]), float(frame["p2Stats"][0])]
+        if any(abs(simulated - recorded) > HEALTH_TOLERANCE for simulated, recorded in zip(simulator.health, recorded_health)):
+            broken.add("player_health")
+
+        stats = self.stats
+        stats.frames += 1
+        for rule in broken:
+            stats.divergences[rule] += 1
+        if broken and not self.diverged:
+            self.diverged = True
+            for rule in RULES:
+                if rule in broken:
+                    stats.first_divergences[rule] += 1
+                    break
+
+    def finish(self):
+        if not self.diverged:
+            self.stats.clean_turns += 1
+
+
+def check_replay(path):
+    """Compares the simulator with every action phase of a replay
+
+    Args:
+        path: The path of a .replay file
+
+    Returns:
+        A FidelityStats for the replay
+    """
+    stats = FidelityStats()
+    stats.replays = 1
+    config = None
+    decoder = None
+    categories = None
+    turn = None
+    with open(path) as replay:
+        for line in replay:
+            line = line.strip()
+            if not line:
+                continue
+            message_type = get_message_type(line)
+            if message_type is None:
+                config = json.loads(line)
+                decoder = EventDecoder(config)
+                # Maps unit types to 0 for firewalls and 1 for information units
+                categories = {unit_information.get("shorthand"): unit_information.get("unitCategory")
+                              for unit_information in config["unitInformation"]}
+                continue
+            if message_type != 1 or config is None:
+                continue
+            frame = json.loads(line)
+            if frame["turnInfo"][2] == 0:
+                if turn is not None:
+                    turn.finish()
+                turn = _TurnCheck(config, frame, decoder, categories, stats)
+            elif turn is not None:
+                turn.compare(frame, decoder)
+    if turn is not None:
+        turn.finish()
+    return stats
+
+
+def _check_replay_safely(path):
+    try:
+        return check_replay(path)
+    except Exception:
+        traceback.print_exc()
+        stats = FidelityStats()
+        stats.replays = 1
+        stats.errors = 1
+        return stats
+
+
+def check_replays(paths, processes=None):
+    """Compares the simulator with every replay, one replay per worker process at a time
+
+    Args:
+        paths: The paths of .replay files
+        processes: The number of worker processes, the number of CPUs if None
+
+    Returns:
+        A FidelityStats totalling every replay. Replays that fail to load are counted in errors
+    """
+    stats = FidelityStats()
+    with multiprocessing.Pool(processes) as pool:
+        for replay_stats in pool.imap_unordered(_check_replay_safely, paths, chunksize=8):
+            stats.merge(replay_stats)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the action phase simulator with recorded replays.")
+    parser.add_argument("paths", nargs="+", help="replay files, or folders holding .replay files")
+    parser.add_argument("-p", "--processes", type=int, default=None, help="number of worker processes, defaults to the number of CPUs")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, "**", "*.replay"), recursive=True)))
+        else:
+            paths.append(path)
+    print(check_replays(paths, args.processes).summary())
+
+
+if __name__ == "__main__":
+    main()
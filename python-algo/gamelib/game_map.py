@@ -1,6 +1,60 @@
 import math
+import copy
+import random
 from .unit import GameUnit
 from .util import debug_write
+from .geometry import ARENA_SIZE, CELL_COUNT, CELL_X, CELL_Y, IN_BOUNDS, CELLS, EDGES
+
+# Shared by every GameMap, maps (radius, get hit radius) to the in range offsets of get_locations_in_range
+_RANGE_OFFSETS = {}
+# Maps (cell index, radius, get hit radius) to the in range cell indices
+_DISKS = {}
+
+
+def _get_range_offsets(radius, hit_radius):
+    offsets = _RANGE_OFFSETS.get((radius, hit_radius))
+    if offsets is None:
+        search_radius = math.ceil(radius)
+        offsets = []
+        for dx in range(-search_radius, search_radius + 1):
+            for dy in range(-search_radius, search_radius + 1):
+                # A unit with a given range affects all locations who's centers are within that range + get hit radius
+                if math.sqrt(dx ** 2 + dy ** 2) < radius + hit_radius:
+                    offsets.append((dx, dy))
+        offsets = tuple(offsets)
+        _RANGE_OFFSETS[(radius, hit_radius)] = offsets
+    return offsets
+
+
+def _get_disk(index, radius, hit_radius):
+    """
+    The cell indices get_locations_in_range returns for a location, in the same order
+    """
+    key = (index, radius, hit_radius)
+    disk = _DISKS.get(key)
+    if disk is None:
+        x, y = CELL_X[index], CELL_Y[index]
+        disk = []
+        for dx, dy in _get_range_offsets(radius, hit_radius):
+            new_x, new_y = x + dx, y + dy
+            if 0 <= new_x < ARENA_SIZE and 0 <= new_y < ARENA_SIZE and IN_BOUNDS[new_y * ARENA_SIZE + new_x]:
+                disk.append(new_y * ARENA_SIZE + new_x)
+        disk = _DISKS[key] = tuple(disk)
+    return disk
+
+
+# Random keys for Zobrist hashing, indexed by [(unit type index * 2 + player index) * 2 + upgraded][cell index].
+# They come from a fixed seed, so the same board has the same hash in every process
+_ZOBRIST_RANDOM = random.Random(0x5eed)
+_ZOBRIST_KEYS = []
+_HASH_MASK = (1 << 64) - 1
+
+
+def _get_zobrist_keys(type_count):
+    while len(_ZOBRIST_KEYS) < type_count * 4:
+        _ZOBRIST_KEYS.append(tuple(_ZOBRIST_RANDOM.getrandbits(64) for _ in range(CELL_COUNT)))
+    return _ZOBRIST_KEYS
+
 
 class GameMap:
     """Holds data about the current game map and provides functions
@@ -18,6 +72,9 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * zobrist_keys (list): The random keys hashed by get_zobrist_hash, indexed by [(unit type index * 2 + player index) * 2 + upgraded][cell index]
+        * stationary_version (int): Incremented whenever add_unit, upgrade_unit, remove_unit or item assignment changes a stationary unit.
+          Used by GameState to know when cached pathing is out of date
 
     """
     def __init__(self, config):
@@ -35,37 +92,212 @@ class GameMap:
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
-        self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.stationary_version = 0
+        self.__stationary_changes = []
+        # Maps unit types to their index in unitInformation
+        self._type_indices = {unit_information.get("shorthand"): type_index for type_index, unit_information in enumerate(config["unitInformation"])}
+        self.zobrist_keys = _get_zobrist_keys(len(config["unitInformation"]))
+        # Stationary units are xored into the hash, mobile units are added so units stacked on one location do not cancel out
+        self._stationary_hash = 0
+        self._mobile_hash = 0
+        # Flags the cells whose units are still shared with a copy of this map, None if the map was never copied
+        self.__shared = None
+        # Flags the cells a copied map has not looked up since it was copied, None if the map is not a copy
+        self.__inherited = None
+        # The cells changed since checkpoint was first called, None when changes are not being recorded
+        self.__journal = None
+        self._reset_cells()
+        self.__cells = iter(CELLS)
+        self.__hit_radius = self.config["unitInformation"][0].get('getHitRadius', 0)
+        # Build the range tables of every radius units can have up front
+        for unit_information in self.config["unitInformation"]:
+            for stats in [unit_information, unit_information.get('upgrade', {})]:
+                for key in ['attackRange', 'shieldRange', 'selfDestructRange']:
+                    if key in stats:
+                        _get_range_offsets(stats[key], self.__hit_radius)
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
             x,y = location
-            return self.__map[x][y]
+            return self.__units(x, y)
         self._invalid_coordinates(location)
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            self._record(location[0], location[1])
+            self.__set_cell(location[0], location[1], val)
+            self._stationary_changed(location)
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
+        self.__cells = iter(CELLS)
         return self
     
     def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        x, y = next(self.__cells)
+        return [x, y]
+
+    def copy(self):
+        """Makes an independent copy of the map, for trying out hypothetical changes
+
+        Locations are shared between the two maps until one of them changes the location, or the copy
+        looks it up, at which point that map gets its own copy of the location's units. Looking up a location
+        of the original map never copies it, so units already held keep being the map's units.
+        This makes copying cheap when only a few locations are touched afterwards.
+        Units changed directly, like by setting their health, are only private to the map once it has its own copy
+        of their location, which the copy gets as soon as it looks the location up.
+
+        Returns:
+            A new map holding the same units
+
+        """
+        game_map = self.__class__.__new__(self.__class__)
+        game_map.__dict__.update(self.__dict__)
+        # The copy starts a new change log, at the same stationary_version as this map
+        game_map.__stationary_changes = []
+        game_map.__cells = iter(CELLS)
+        game_map.__journal = None
+        self._copy_cells(game_map)
+        return game_map
+
+    def _copy_cells(self, game_map):
+        """Gives a copy of the map its own cells. Alternative map storages override this along with _reset_cells
+        """
+        game_map.__map = [column[:] for column in self.__map]
+        self.__shared = bytearray([1]) * CELL_COUNT
+        game_map.__shared = bytearray([1]) * CELL_COUNT
+        game_map.__inherited = bytearray([1]) * CELL_COUNT
+
+    def __units(self, x, y):
+        """
+        Looks up a location. A copied map gets its own units the first time, so the caller can change them
+        """
+        units = self.__map[x][y]
+        if self.__inherited is None:
+            return units
+        index = y * ARENA_SIZE + x
+        if self.__inherited[index]:
+            self.__inherited[index] = 0
+            self.__shared[index] = 0
+            units = [copy.copy(unit) for unit in units]
+            self.__map[x][y] = units
+        return units
+
+    def __writable_units(self, x, y, copy_units):
+        """
+        Looks up a location before changing it, giving this map its own list of units if it is shared with a copy.
+        copy_units also copies the units, for changes made to the units themselves
+        """
+        units = self.__units(x, y)
+        if self.__shared is None:
+            return units
+        index = y * ARENA_SIZE + x
+        if self.__shared[index]:
+            self.__shared[index] = 0
+            units = [copy.copy(unit) for unit in units] if copy_units else list(units)
+            self.__map[x][y] = units
+        return units
+
+    def __set_cell(self, x, y, units):
+        for unit in self.__map[x][y]:
+            self.__hash_unit(x, y, unit, -1)
+        for unit in units:
+            self.__hash_unit(x, y, unit, 1)
+        self.__map[x][y] = units
+        if self.__shared is not None:
+            self.__shared[y * ARENA_SIZE + x] = 0
+        if self.__inherited is not None:
+            self.__inherited[y * ARENA_SIZE + x] = 0
+
+    def checkpoint(self):
+        """Starts recording the changes made through GameMap functions, so they can be undone with rollback.
+        Changes keep being recorded until commit is called.
+
+        Returns:
+            A checkpoint to pass to rollback
+
+        """
+        if self.__journal is None:
+            self.__journal = []
+        return len(self.__journal)
+
+    def rollback(self, checkpoint):
+        """Undoes every change made since the checkpoint was taken, in reverse order.
+        Rolling back to the same checkpoint again later is allowed.
+
+        Args:
+            checkpoint: A value returned by checkpoint
+
+        """
+        journal = self.__journal
+        if journal is None:
+            self.warn("rollback was called without a checkpoint")
+            return
+        while len(journal) > checkpoint:
+            (x, y), state = journal.pop()
+            self._restore_cell(x, y, state)
+
+    def commit(self):
+        """Stops recording changes, keeping every change made since the first checkpoint
+        """
+        self.__journal = None
+
+    def _record(self, x, y):
+        """Saves a location before it is changed, if changes are being recorded
+        """
+        if self.__journal is not None:
+            self.__journal.append(((x, y), self._cell_state(x, y)))
+
+    def _cell_state(self, x, y):
+        """Gets everything needed to restore a location with _restore_cell. Alternative map storages override this
+        """
+        return [copy.copy(unit) for unit in self.__map[x][y]]
+
+    def _restore_cell(self, x, y, state):
+        """Puts a location back to a state from _cell_state. Alternative map storages override this
+        """
+        stationary = any(unit.stationary for unit in self.__map[x][y]) or any(unit.stationary for unit in state)
+        self.__set_cell(x, y, state)
+        if stationary:
+            self._stationary_changed([x, y])
+
+    def _unit_key(self, index, type_index, player_index, upgraded):
+        """Gets the Zobrist key of a unit at a cell index
+        """
+        return self.zobrist_keys[(type_index * 2 + (player_index == 1)) * 2 + bool(upgraded)][index]
+
+    def _hash_stationary(self, index, type_index, player_index, upgraded):
+        """Adds or removes a stationary unit from the hash, xoring it is its own inverse
+        """
+        self._stationary_hash ^= self._unit_key(index, type_index, player_index, upgraded)
+
+    def _hash_mobile(self, index, type_index, player_index, sign):
+        """Adds (sign 1) or removes (sign -1) a mobile unit from the hash
+        """
+        self._mobile_hash = (self._mobile_hash + sign * self._unit_key(index, type_index, player_index, False)) & _HASH_MASK
+
+    def __hash_unit(self, x, y, unit, sign):
+        index = y * ARENA_SIZE + x
+        if unit.stationary:
+            self._hash_stationary(index, self._type_indices[unit.unit_type], unit.player_index, unit.upgraded)
+        else:
+            self._hash_mobile(index, self._type_indices[unit.unit_type], unit.player_index, sign)
+
+    def get_zobrist_hash(self):
+        """Gets a 64 bit hash of the units on the map, made of their locations, types, owners and whether they are upgraded.
+        It is updated as units are added, removed or upgraded through GameMap functions, so it costs nothing to read.
+        Units changed directly, like the lists returned by game_map[x, y], are not seen by the hash.
+
+        Returns:
+            An integer, equal for any two maps holding the same units
+        """
+        return self._stationary_hash ^ self._mobile_hash
+
+    def _reset_cells(self):
+        """Empties every location of the map. Alternative map storages override this to set up their own cells
+        """
+        self.__map = self.__empty_grid()
 
     def __empty_grid(self):
         grid = []
@@ -75,6 +307,27 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def _stationary_changed(self, location):
+        self.stationary_version += 1
+        self.__stationary_changes.append([location[0], location[1]])
+        if len(self.__stationary_changes) > 64:
+            del self.__stationary_changes[:32]
+
+    def get_stationary_changes(self, since_version):
+        """Gets the locations where a stationary unit was added or removed
+
+        Args:
+            since_version: A previous value of stationary_version
+
+        Returns:
+            The changed locations in order, or None if too many changes have happened since then to list them
+
+        """
+        missing = self.stationary_version - since_version
+        if missing < 0 or missing > len(self.__stationary_changes):
+            return None
+        return self.__stationary_changes[len(self.__stationary_changes) - missing:]
+
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
 
@@ -89,6 +342,9 @@ class GameMap:
         
         """
         x, y = location
+        if type(x) == int and type(y) == int:
+            return 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and IN_BOUNDS[y * ARENA_SIZE + x] == 1
+
         half_board = self.HALF_ARENA
 
         row_size = y + 1
@@ -117,8 +373,7 @@ class GameMap:
             self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [[x, y] for x, y in EDGES[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -127,35 +382,16 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[[x, y] for x, y in edge] for edge in EDGES]
     
-    def add_unit(self, unit_type, location, player_index=0):
+    def add_unit(self, unit_type, location, player_index=0, health=None):
         """Add a single GameUnit to the map at the given location.
 
         Args:
             unit_type: The type of the new unit. Use the constants provided in algo_strategy.
             location: A list of two integers representing the [x,y] coordinate of the new unit
             player_index: The index corresponding to the player controlling the new unit, 0 for you 1 for the enemy
+            health: The health of the new unit, defaults to its max health
 
         This function does not affect your turn and only changes the data stored in GameMap. The intended use of this function
         is to allow you to create arbitrary gamestates. Using this function on the game_map provided with game_state will 
@@ -167,11 +403,88 @@ class GameMap:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
-        new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
+        self._record(x, y)
+        new_unit = GameUnit(unit_type, self.config, player_index, health, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self.__writable_units(x, y, False).append(new_unit)
+            self.__hash_unit(x, y, new_unit, 1)
         else:
-            self.__map[x][y] = [new_unit]
+            self.__set_cell(x, y, [new_unit])
+            self._stationary_changed(location)
+
+    def upgrade_unit(self, location):
+        """Upgrade the stationary unit at the given location.
+
+        Args:
+            location: The location of the unit to upgrade
+
+        Returns:
+            The upgraded unit, or None if there is no stationary unit at the location
+
+        Like add_unit, this function does not affect your turn and only changes the data stored in GameMap.
+        Use GameState.attempt_upgrade to upgrade your own units.
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+
+        x, y = location
+        if not any(unit.stationary for unit in self.__map[x][y]):
+            return
+        self._record(x, y)
+        for unit in self.__writable_units(x, y, True):
+            if unit.stationary:
+                self.__hash_unit(x, y, unit, -1)
+                unit.upgrade()
+                self.__hash_unit(x, y, unit, 1)
+                self._stationary_changed(location)
+                return unit
+
+    def set_pending_removal(self, location, pending_removal=True):
+        """Marks the stationary unit at the given location as being removed by its owner.
+
+        Args:
+            * location: The location of the unit
+            * pending_removal: Whether the unit is pending removal
+
+        Like add_unit, this function does not affect your turn and only changes the data stored in GameMap.
+        Use GameState.attempt_remove to remove your own units.
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+
+        x, y = location
+        if not any(unit.stationary for unit in self.__map[x][y]):
+            return
+        self._record(x, y)
+        for unit in self.__writable_units(x, y, True):
+            if unit.stationary:
+                unit.pending_removal = pending_removal
+
+    def get_blocked_grid(self):
+        """Gets which locations hold a stationary unit
+
+        Returns:
+            A bytearray indexed by cell index (y * ARENA_SIZE + x), holding 1 for every location containing a stationary unit
+        """
+        blocked = bytearray(CELL_COUNT)
+        grid = self.__map
+        for x, y in CELLS:
+            for unit in grid[x][y]:
+                if unit.stationary:
+                    blocked[y * ARENA_SIZE + x] = 1
+                    break
+        return blocked
+
+    def _stationary_stats(self, index):
+        """Gets the owner and UnitStats of the stationary unit at a cell index, or None if there is none.
+        Unlike indexing the map, this never copies a location shared with a copy of the map. Alternative map storages override this
+        """
+        for unit in self.__map[index % ARENA_SIZE][index // ARENA_SIZE]:
+            if unit.stationary:
+                return unit.player_index, unit.stats
+        return None
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -186,7 +499,10 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
-        self.__map[x][y] = []
+        self._record(x, y)
+        if any(unit.stationary for unit in self.__map[x][y]):
+            self._stationary_changed(location)
+        self.__set_cell(x, y, [])
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -206,8 +522,16 @@ class GameMap:
 
         x, y = location
         locations = []
+        if x == int(x) and y == int(y):
+            x, y = int(x), int(y)
+            for dx, dy in _get_range_offsets(radius, self.__hit_radius):
+                new_x, new_y = x + dx, y + dy
+                if 0 <= new_x < ARENA_SIZE and 0 <= new_y < ARENA_SIZE and IN_BOUNDS[new_y * ARENA_SIZE + new_x]:
+                    locations.append([new_x, new_y])
+            return locations
+
         search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
+        getHitRadius = self.__hit_radius
         for i in range(int(x - search_radius), int(x + search_radius + 1)):
             for j in range(int(y - search_radius), int(y + search_radius + 1)):
                 new_location = [i, j]
@@ -1,11 +1,24 @@
 import math
 import json
 import sys
-
-from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
-from .unit import GameUnit
-from .game_map import GameMap
+from collections import namedtuple
+
+from .navigation import ShortestPathFinder, NavigationField, get_blocked_grid
+from .geometry import CELL_COUNT, CELL_X, CELL_Y, CELLS, EDGE_OF, location_to_index
+from .bitboard import Bitboard
+from .threat_map import ThreatMap
+from .util import send_command, debug_write, parse_message
+from .unit import GameUnit, get_unit_stats
+from .game_map import GameMap, _get_disk
+from .compact_map import CompactGameMap
+
+"""
+The timing of a unit along its path, returned by GameState.get_path_trace.
+The unit arrives on path[i] on frame enter_frames[i] and leaves it on frame leave_frames[i].
+exposure maps the (x, y) location of every enemy attacker the unit passes to the number of frames
+the unit spends in its range, and damage is the total damage those attackers could deal in that time.
+"""
+PathTrace = namedtuple("PathTrace", ["path", "enter_frames", "leave_frames", "exposure", "damage"])
 
 def is_stationary(unit_type):
     """
@@ -47,12 +60,14 @@ class GameState:
 
     """
 
-    def __init__(self, config, serialized_string):
+    def __init__(self, config, serialized_string, compact_map=False):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn.
+              A ParsedMessage or an already parsed dict are used without being parsed again
+            * compact_map (bool): If true, store the board in a CompactGameMap instead of a GameMap
 
         """
         self.serialized_string = serialized_string
@@ -89,8 +104,14 @@ class GameState:
         BITS = self.BITS
         CORES = self.CORES
 
-        self.game_map = GameMap(self.config)
+        self.game_map = CompactGameMap(self.config) if compact_map else GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
+        self._navigation_fields = {}
+        self._navigation_version = None
+        self._blocked_grid = None
+        self._bitboard = None
+        self._bitboard_version = None
+        self._threat_map = None
         self._build_stack = []
         self._deploy_stack = []
         self._player_resources = [
@@ -101,9 +122,9 @@ class GameState:
     def __parse_state(self, state_line):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state_line is the game state as a json string, a ParsedMessage or a parsed dict.
         """
-        state = json.loads(state_line)
+        state = parse_message(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -141,13 +162,12 @@ class GameState:
                 if unit_type == REMOVE:
                     # Quick fix will deploy engine fix soon
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].pending_removal = True
+                        self.game_map.set_pending_removal([x, y])
                 elif unit_type == UPGRADE:
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
+                        self.game_map.upgrade_unit([x, y])
                 else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    self.game_map.add_unit(unit_type, [x, y], player_number, hp)
 
     def __resource_required(self, unit_type):
         return self.CORES if is_stationary(unit_type) else self.BITS
@@ -180,6 +200,82 @@ class GameState:
         send_command(build_string)
         send_command(deploy_string)
 
+    def fork(self):
+        """Makes an independent copy of this game state, for trying out hypothetical moves.
+        Changing the copy's map, resources or spawn commands does not affect this game state.
+
+        The config is shared, locations of the map are only copied once one of the two states changes them
+        or the fork looks them up, and cached pathing is copied so the fork keeps repairing it.
+        Units already held from this game state's map stay its units.
+        Checkpoints taken on this game state can not be rolled back on the fork.
+
+        Returns:
+            A new GameState
+        """
+        # Bring the caches up to date first, the fork's map starts a new change log
+        self.__update_navigation_fields()
+        if self._bitboard is not None:
+            self.get_bitboard()
+        if self._threat_map is not None:
+            self._threat_map.update()
+
+        state = GameState.__new__(GameState)
+        state.__dict__.update(self.__dict__)
+        state.game_map = self.game_map.copy()
+        state._shortest_path_finder = ShortestPathFinder()
+        state._navigation_fields = {edge: field.copy() for edge, field in self._navigation_fields.items()}
+        if self._blocked_grid is not None:
+            state._blocked_grid = self._blocked_grid[:]
+        if self._bitboard is not None:
+            state._bitboard = Bitboard(self._bitboard.blocked_mask)
+        if self._threat_map is not None:
+            state._threat_map = self._threat_map.copy(state.game_map)
+        state._build_stack = list(self._build_stack)
+        state._deploy_stack = list(self._deploy_stack)
+        state._player_resources = [dict(resources) for resources in self._player_resources]
+        return state
+
+    def get_zobrist_hash(self):
+        """Gets a 64 bit hash of the units on the map, see GameMap.get_zobrist_hash.
+        Use it as a key to cache results that only depend on the board, like paths and damage estimates.
+
+        Returns:
+            An integer, equal for any two game states whose maps hold the same units
+        """
+        return self.game_map.get_zobrist_hash()
+
+    def checkpoint(self):
+        """Starts recording changes to this game state, so they can be undone with rollback.
+        This covers the map, both players' resources and the spawn commands of attempt_spawn, attempt_remove and attempt_upgrade.
+        Use it to try out moves on a single game state instead of forking it for every move.
+
+        Returns:
+            A checkpoint to pass to rollback
+        """
+        resources = self._player_resources
+        return (self.game_map.checkpoint(), len(self._build_stack), len(self._deploy_stack),
+                resources[0]['cores'], resources[0]['bits'], resources[1]['cores'], resources[1]['bits'])
+
+    def rollback(self, checkpoint):
+        """Undoes every change made since the checkpoint was taken
+
+        Args:
+            checkpoint: A value returned by checkpoint
+        """
+        map_checkpoint, build_length, deploy_length, my_cores, my_bits, enemy_cores, enemy_bits = checkpoint
+        self.game_map.rollback(map_checkpoint)
+        del self._build_stack[build_length:]
+        del self._deploy_stack[deploy_length:]
+        self._player_resources[0]['cores'] = my_cores
+        self._player_resources[0]['bits'] = my_bits
+        self._player_resources[1]['cores'] = enemy_cores
+        self._player_resources[1]['bits'] = enemy_bits
+
+    def commit(self):
+        """Stops recording changes, keeping every change made since the first checkpoint
+        """
+        self.game_map.commit()
+
     def get_resource(self, resource_type, player_index = 0):
         """Gets a players resources
 
@@ -330,7 +426,7 @@ class GameState:
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = EDGE_OF[location_to_index(location)] in (self.game_map.BOTTOM_LEFT, self.game_map.BOTTOM_RIGHT)
 
         if self.enable_warnings:
             fail_reason = ""
@@ -438,7 +534,7 @@ class GameState:
                     if resources[CORES] >= costs[CORES] and resources[BITS] >= costs[BITS]:
                         self.__set_resource(CORES, 0 - costs[CORES])
                         self.__set_resource(BITS, 0 - costs[BITS])
-                        existing_unit.upgrade()
+                        self.game_map.upgrade_unit([x, y])
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
@@ -488,8 +584,173 @@ class GameState:
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        field = self.get_navigation_field(target_edge)
+        if field is None:
+            return
+        return field.get_path(start_location)
+
+    def get_path_trace(self, start_location, unit_type, target_edge=None, player_index=0):
+        """Gets the path a unit would take along with when it reaches each location, from its speed.
+        Units attack once every frame, so the frames spent in each enemy attacker's range tell apart
+        fast units that rush past a destructor from slow units that linger in its range.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            unit_type: The type of the unit, PING, EMP or SCRAMBLER
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+            player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            A PathTrace. Attacks start on frame 1, after the unit spawned, and a unit that scores is not attacked on its last location.
+            None if start_location is blocked or unit_type is not a mobile unit
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+        if unit_type not in ALL_UNITS or is_stationary(unit_type):
+            self._invalid_unit(unit_type)
+            return
+        if self.contains_stationary_unit(start_location):
+            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            return
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+
+        field = self.get_navigation_field(target_edge)
+        if field is None:
+            return
+        trace = field.get_trace(start_location, get_unit_stats(self.config, unit_type).speed)
+        if trace is None:
+            return
+        path, enter_frames, leave_frames = trace
+
+        threat_map = self.get_threat_map()
+        attackers = threat_map._attackers[1 - player_index]
+        walker_damage = threat_map.walker_damage[1 - player_index]
+        exposure = {}
+        damage = 0
+        for location, enter_frame, leave_frame in zip(path, enter_frames, leave_frames):
+            frames = leave_frame - max(enter_frame, 1)
+            if frames <= 0:
+                continue
+            index = location_to_index(location)
+            damage += frames * walker_damage[index]
+            for attacker in attackers[index]:
+                attacker_location = (attacker % self.ARENA_SIZE, attacker // self.ARENA_SIZE)
+                exposure[attacker_location] = exposure.get(attacker_location, 0) + frames
+        return PathTrace(path, enter_frames, leave_frames, exposure, damage)
+
+    def get_navigation_field(self, target_edge):
+        """Gets the pathing towards an edge for every start location on the current map.
+        The field is computed once per edge and reused for as long as the map is unchanged. When a few stationary units
+        are added or removed, the cached fields are repaired around the changed locations instead of being rebuilt.
+
+        Args:
+            target_edge: The edge units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            A NavigationField, whose get_path function returns the same paths as find_path_to_edge.
+            None if target_edge is not a valid edge
+
+        """
+        self.__update_navigation_fields()
+        field = self._navigation_fields.get(target_edge)
+        if field is None:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            if end_points is None:
+                return
+            if not self._navigation_fields:
+                self._blocked_grid = get_blocked_grid(self.game_map)
+            field = NavigationField(self._blocked_grid, end_points)
+            self._navigation_fields[target_edge] = field
+        return field
+
+    def __update_navigation_fields(self):
+        """
+        Repairs the cached navigation fields after a few stationary units changed, or drops them after many changes
+        """
+        if self._navigation_version == self.game_map.stationary_version:
+            return
+        changes = None
+        if self._navigation_fields:
+            changes = self.game_map.get_stationary_changes(self._navigation_version)
+        if changes is None or len(changes) > 8:
+            self._navigation_fields = {}
+        else:
+            for location in changes:
+                blocked = bool(self.contains_stationary_unit(location))
+                self._blocked_grid[location_to_index(location)] = blocked
+                for field in self._navigation_fields.values():
+                    field.set_blocked(location, blocked)
+        self._navigation_version = self.game_map.stationary_version
+
+    def evaluate_spawn_locations(self, locations, player_index=0):
+        """Gets the path of a unit spawned at each location, and the damage it can expect to take along it.
+        The damage every location is threatened with is computed once and shared by all of the paths.
+
+        Args:
+            locations: A list of locations to evaluate
+            player_index: The player controlling the hypothetical units, 0 for you 1 for the enemy
+
+        Returns:
+            A list in the same order as locations. Each entry is a dict with the unit's 'path', its 'path_length'
+            (the number of moves it makes) and the total 'damage' per frame of enemy firewalls in range of each location on the path.
+            The entry is None if the location is blocked.
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+
+        threat = self.get_threat_map().walker_damage[1 - player_index]
+
+        evaluations = []
+        for location in locations:
+            path = self.find_path_to_edge(location)
+            if path is None:
+                evaluations.append(None)
+                continue
+            damage = 0
+            for path_location in path:
+                damage += threat[location_to_index(path_location)]
+            evaluations.append({'path': path, 'path_length': len(path) - 1, 'damage': damage})
+        return evaluations
+
+    def get_bitboard(self):
+        """Gets a Bitboard of the pathable cells of the current map.
+        It is kept in sync with the map, so use its with_blocked function to try out hypothetical firewalls.
+
+        Returns:
+            A Bitboard, useful for cheap pocket and reachability checks
+
+        """
+        if self._bitboard_version != self.game_map.stationary_version:
+            changes = None
+            if self._bitboard is not None:
+                changes = self.game_map.get_stationary_changes(self._bitboard_version)
+            if changes is None:
+                self._bitboard = Bitboard.from_grid(get_blocked_grid(self.game_map))
+            else:
+                for location in changes:
+                    self._bitboard.set_blocked(location, bool(self.contains_stationary_unit(location)))
+            self._bitboard_version = self.game_map.stationary_version
+        return self._bitboard
+
+    def can_reach_edge(self, start_location, target_edge=None):
+        """Checks if a unit at a given location could reach an edge, without computing its path
+
+        Args:
+            start_location: The location of a hypothetical unit
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+
+        Returns:
+            True if the unit's path ends on the edge, False if it would self destruct or start_location is blocked
+
+        """
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+        return self.get_bitboard().can_reach_edge(start_location, target_edge)
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return firewall unit if it is
@@ -607,6 +868,82 @@ class GameState:
                     target_x_distance = unit_x_distance
         return target
 
+    def get_targets(self, attacking_units=None):
+        """Gets the targets of many attacking units at once, with the same priorities as get_target.
+        The board is read once: for every location, the unit each player's attackers would prefer there
+        is kept with the part of its priority that does not depend on the attacker. Each attacker then
+        only compares one candidate per location in its range, by distance and that stored priority.
+
+        Args:
+            attacking_units: A list of GameUnits, every unit on the board that deals damage if None
+
+        Returns:
+            A dict mapping each attacking unit to the GameUnit it would choose to attack, or None
+
+        """
+        hit_radius = self.config["unitInformation"][0].get('getHitRadius', 0)
+        # Indexed by [defending player_index * 2 + stationary][cell index], holds (priority, unit) of the best unit there
+        candidates = [[None] * CELL_COUNT for _ in range(4)]
+        find_attackers = attacking_units is None
+        if find_attackers:
+            attacking_units = []
+        for x, y in CELLS:
+            units = self.game_map[x, y]
+            if not units:
+                continue
+            index = y * self.ARENA_SIZE + x
+            for unit in units:
+                if find_attackers and (unit.damage_f > 0 or unit.damage_i > 0):
+                    attacking_units.append(unit)
+                # Player 0 attacks the lowest units, player 1 the highest
+                priority = (unit.health, y if unit.player_index == 1 else -y, -abs(self.HALF_ARENA - 0.5 - x))
+                table = candidates[unit.player_index * 2 + unit.stationary]
+                if table[index] is None or priority < table[index][0]:
+                    table[index] = (priority, unit)
+
+        targets = {}
+        for attacker in attacking_units:
+            if not isinstance(attacker, GameUnit):
+                self.warn("Passed a {} to get_targets as an attacking unit. Expected a GameUnit.".format(type(attacker)))
+                continue
+            enemy = 1 - attacker.player_index
+            searches = []
+            # Information units are always preferred over firewalls
+            if attacker.damage_i > 0:
+                searches.append(candidates[enemy * 2])
+            if attacker.damage_f > 0:
+                searches.append(candidates[enemy * 2 + 1])
+            target = None
+            target_key = None
+            for table in searches:
+                for cell in _get_disk(attacker.y * self.ARENA_SIZE + attacker.x, attacker.attackRange, hit_radius):
+                    candidate = table[cell]
+                    if candidate is None:
+                        continue
+                    dx, dy = CELL_X[cell] - attacker.x, CELL_Y[cell] - attacker.y
+                    key = (dx * dx + dy * dy, candidate[0])
+                    if target is None or key < target_key:
+                        target = candidate[1]
+                        target_key = key
+                if target is not None:
+                    break
+            targets[attacker] = target
+        return targets
+
+    def get_threat_map(self):
+        """Gets the threat map of the current map, which holds the number of attackers and the damage per frame
+        each player's stationary units can deal to every location. It is kept up to date as units are added or removed.
+
+        Returns:
+            A ThreatMap, indexed by [attacking player_index][cell index]
+
+        """
+        if self._threat_map is None:
+            self._threat_map = ThreatMap(self.game_map)
+        else:
+            self._threat_map.update()
+        return self._threat_map
+
     def get_attackers(self, location, player_index):
         """Gets the stationary units threatening a given location
 
@@ -621,20 +958,10 @@ class GameState:
 
         if not player_index == 0 and not player_index == 1:
             self._invalid_player_index(player_index)
+            return []
         if not self.game_map.in_arena_bounds(location):
             self.warn("Location {} is not in the arena bounds.".format(location))
+            return []
 
-        attackers = []
-        """
-        Get locations in the range of DESTRUCTOR units
-        """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
-        for location_unit in possible_locations:
-            for unit in self.game_map[location_unit]:
-                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) >= unit.attackRange:
-                    attackers.append(unit)
-        return attackers
+        attacker_locations = self.get_threat_map().get_attacker_locations(location, 1 - player_index)
+        return [self.contains_stationary_unit(attacker_location) for attacker_location in attacker_locations]
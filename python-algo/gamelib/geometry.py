@@ -0,0 +1,83 @@
+"""
+The static geometry of the diamond shaped arena, computed once when gamelib is imported.
+
+Every cell of the 28x28 square has a cell index of y * ARENA_SIZE + x. The tables below
+are indexed by cell and never change, so pathing, range queries and map iteration can
+look values up instead of recomputing them. Locations are [x, y] lists everywhere else
+in gamelib, the tables here store (x, y) tuples so they can be shared safely.
+"""
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+CELL_COUNT = ARENA_SIZE * ARENA_SIZE
+
+# Indexed like GameMap edges
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+
+
+def _in_diamond(x, y):
+    if y < HALF_ARENA:
+        return HALF_ARENA - 1 - y <= x <= HALF_ARENA + y
+    return y - HALF_ARENA <= x <= ARENA_SIZE + HALF_ARENA - 1 - y
+
+
+def _build_neighbor_table():
+    # Neighbors are listed up, down, right, left, the order ShortestPathFinder checks them in,
+    # with locations outside of the arena left out
+    table = []
+    for index in range(CELL_COUNT):
+        x, y = index % ARENA_SIZE, index // ARENA_SIZE
+        neighbors = []
+        if _in_diamond(x, y):
+            for nx, ny in [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]:
+                if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and _in_diamond(nx, ny):
+                    neighbors.append(ny * ARENA_SIZE + nx)
+        table.append(tuple(neighbors))
+    return tuple(table)
+
+
+def _build_edges():
+    top_right = tuple((HALF_ARENA + num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    top_left = tuple((HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    bottom_left = tuple((HALF_ARENA - 1 - num, num) for num in range(HALF_ARENA))
+    bottom_right = tuple((HALF_ARENA + num, num) for num in range(HALF_ARENA))
+    return (top_right, top_left, bottom_left, bottom_right)
+
+
+def _build_edge_table():
+    table = [-1] * CELL_COUNT
+    for edge, locations in enumerate(EDGES):
+        for x, y in locations:
+            table[y * ARENA_SIZE + x] = edge
+    return tuple(table)
+
+
+IN_BOUNDS = bytes(_in_diamond(i % ARENA_SIZE, i // ARENA_SIZE) for i in range(CELL_COUNT))
+CELL_X = tuple(i % ARENA_SIZE for i in range(CELL_COUNT))
+CELL_Y = tuple(i // ARENA_SIZE for i in range(CELL_COUNT))
+# The in bounds cells in the order GameMap iterates over them, bottom row first and left to right within a row
+CELL_INDICES = tuple(i for i in range(CELL_COUNT) if IN_BOUNDS[i])
+CELLS = tuple((CELL_X[i], CELL_Y[i]) for i in CELL_INDICES)
+NEIGHBORS = _build_neighbor_table()
+# [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right, in the order of GameMap.get_edges
+EDGES = _build_edges()
+# The edge each cell lies on, or -1 for cells that are not on an edge
+EDGE_OF = _build_edge_table()
+
+
+def location_to_index(location):
+    """Converts an in bounds [x, y] location to its cell index, or returns None for locations outside the arena
+    """
+    x, y = location
+    if not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE):
+        return None
+    index = int(y) * ARENA_SIZE + int(x)
+    return index if IN_BOUNDS[index] else None
+
+
+def index_to_location(index):
+    """Converts a cell index to its [x, y] location
+    """
+    return [CELL_X[index], CELL_Y[index]]
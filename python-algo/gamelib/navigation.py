@@ -1,24 +1,43 @@
 import heapq
-import math
 import sys
-import queue
 from .util import debug_write
 
-class Node:
-    """A pathfinding node
+from .geometry import ARENA_SIZE, HALF_ARENA, CELL_COUNT, CELL_X, CELL_Y, CELL_INDICES, NEIGHBORS, location_to_index
 
-    Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a firewall at this node's location
-        * pathlength: The distance between this node and the target location
+"""
+The pathfinder works on flat arrays indexed by cell, using the cell indices and
+neighbor tables of geometry.py.
+"""
+
+
+def _build_idealness_table(direction):
+    table = []
+    for index in range(CELL_COUNT):
+        x, y = index % ARENA_SIZE, index // ARENA_SIZE
+        idealness = 28 * y if direction[1] == 1 else 28 * (27 - y)
+        idealness += x if direction[0] == 1 else 27 - x
+        table.append(idealness)
+    return table
+
+
+IDEALNESS = {(dx, dy): _build_idealness_table((dx, dy)) for dx in (-1, 1) for dy in (-1, 1)}
+
+_NO_FLAGS = bytes(CELL_COUNT)
+_NO_PATHLENGTHS = [-1] * CELL_COUNT
+
+
+def get_blocked_grid(game_map):
+    """Builds the blocked grid of a map
+
+    Args:
+        game_map: The GameMap to read stationary units from
+
+    Returns:
+        A bytearray holding 1 for every cell index that contains a stationary unit, 0 otherwise
 
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    return game_map.get_blocked_grid()
+
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,18 +47,26 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles pathfinding
 
+    The blocked grid, visited flags and path lengths are kept in flat arrays that are
+    allocated once and reused by every call, so repeated pathing does not create new objects.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * blocked (bytearray): 1 for every cell index holding a stationary unit
+        * pathlength (list): The distance between each cell index and the target location, -1 if unreached
 
     """
     def __init__(self):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        self.game_state = None
+        self.blocked = bytearray(CELL_COUNT)
+        self.pathlength = list(_NO_PATHLENGTHS)
+        self._visited = bytearray(CELL_COUNT)
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -47,10 +74,12 @@ class ShortestPathFinder:
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
         """
-        #Initialize map 
+        #Initialize map
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
+        self.blocked[:] = _NO_FLAGS
+        self.pathlength[:] = _NO_PATHLENGTHS
+        self._visited[:] = _NO_FLAGS
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
@@ -67,45 +96,50 @@ class ShortestPathFinder:
         """
         if game_state.contains_stationary_unit(start_point):
             return
+        start = location_to_index(start_point)
+        if start is None:
+            game_state.warn("Attempted to perform pathing from location {} outside of the arena".format(start_point))
+            return
 
-        #Initialize map 
+        #Initialize map
         self.initialize_map(game_state)
         #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self.blocked[:] = get_blocked_grid(game_state.game_map)
         #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
-
-    def _idealness_search(self, start, end_points):
+        targets = [location_to_index(location) for location in end_points]
+        targets = [index for index in targets if index is not None]
+        direction = tuple(self._get_direction_from_endpoints(end_points))
+        ideal_endpoint = self._idealness_search(start, targets, direction)
+        self._validate(ideal_endpoint, targets)
+        return self._get_path(start_point, start, direction)
+
+    def _idealness_search(self, start, targets, direction):
         """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
+        Finds the most ideal tile in our 'pocket' of pathable space.
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
+        blocked = self.blocked
+        visited = self._visited
+        idealness = IDEALNESS[direction]
+        is_target = set(targets)
+        if start in is_target:
+            return start
+
+        visited[start] = 1
         most_ideal = start
-
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_idealness = idealness[start]
+        current = [start]
+        for search_location in current:
+            for neighbor in NEIGHBORS[search_location]:
+                if blocked[neighbor] or visited[neighbor]:
                     continue
-
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
-
-                if current_idealness > best_idealness:
-                    best_idealness = current_idealness
+                if neighbor in is_target:
+                    return neighbor
+                if idealness[neighbor] > best_idealness:
+                    best_idealness = idealness[neighbor]
                     most_ideal = neighbor
-
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+                visited[neighbor] = 1
+                current.append(neighbor)
 
         return most_ideal
 
@@ -119,7 +153,7 @@ class ShortestPathFinder:
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
             A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
@@ -128,15 +162,15 @@ class ShortestPathFinder:
         point = end_points[0]
         x, y = point
         direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
+        if x < HALF_ARENA:
            direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
+        if y < HALF_ARENA:
             direction[1] = -1
         return direction
 
     def _get_idealness(self, location, end_points):
         """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+        Better self destruct locations are more ideal. The endpoints are perfectly ideal.
 
         Returns:
             A location the unit will attempt to reach
@@ -144,147 +178,120 @@ class ShortestPathFinder:
         if location in end_points:
             return sys.maxsize
 
-        direction = self._get_direction_from_endpoints(end_points)
-
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
-
-        return idealness
+        direction = tuple(self._get_direction_from_endpoints(end_points))
+        x, y = location
+        return IDEALNESS[direction][y * ARENA_SIZE + x]
 
-    def _validate(self, ideal_tile, end_points):
+    def _validate(self, ideal_tile, targets):
         """Breadth first search of the grid, setting the pathlengths of each node
 
+        Returns:
+            The cell indices that were given a pathlength, in the order they were reached
+
         """
         #VALDIATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
+        blocked = self.blocked
+        pathlength = self.pathlength
+        if ideal_tile in targets:
+            current = list(targets)
         else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
-
-        #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+            current = [ideal_tile]
+        for location in current:
+            #Set current pathlength to 0
+            pathlength[location] = 0
+
+        #Walk the queue in order, blocked sources are never expanded
+        for current_location in current:
+            if blocked[current_location]:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in NEIGHBORS[current_location]:
+                if blocked[neighbor] or pathlength[neighbor] != -1:
                     continue
-
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
+                pathlength[neighbor] = next_pathlength
+                current.append(neighbor)
 
         #debug_write("Print after validate")
         #self.print_map()
-        return
+        return current
 
-    def _get_path(self, start_point, end_points):
+    def _get_path(self, start_point, start, direction):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
         #GET THE PATH
         path = [start_point]
-        current = start_point
+        current = start
         move_direction = 0
+        pathlength = self.pathlength
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+        while not pathlength[current] == 0:
+            next_move = self._choose_next_move(current, move_direction, direction)
 
-            if current[0] == next_move[0]:
+            if CELL_X[current] == CELL_X[next_move]:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            path.append([CELL_X[next_move], CELL_Y[next_move]])
             current = next_move
-        
+
         #debug_write(path)
         return path
-  
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+
+    def _choose_next_move(self, current_point, previous_move_direction, direction):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
+        blocked = self.blocked
+        pathlength = self.pathlength
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_pathlength = pathlength[current_point]
+        for neighbor in NEIGHBORS[current_point]:
+            if blocked[neighbor]:
                 continue
 
-            new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
-
+            current_pathlength = pathlength[neighbor]
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
-            elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
-                new_best = True
-
             #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            if current_pathlength == best_pathlength and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, direction):
                 continue
 
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
-    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, direction):
         """Compare two tiles and return True if the unit would rather move to the new one
 
         """
+        prev_x, prev_y = CELL_X[prev_tile], CELL_Y[prev_tile]
+        new_x, new_y = CELL_X[new_tile], CELL_Y[new_tile]
+        best_x, best_y = CELL_X[prev_best], CELL_Y[prev_best]
         #True if we are moving in a different direction than prev move and prev is not
         #If we previously moved horizontal, and now one of our options has a different x position then the other (the two options are not up/down)
-        if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
+        if previous_move_direction == self.HORIZONTAL and not new_x == best_x:
             #We want to go up now. If we have not changed our y, we are not going up
-            if prev_tile[1] == new_tile[1]:
-                return False 
-            return True
-        if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
-            if prev_tile[0] == new_tile[0]:
-                #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
-                return False
-            return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
-                return False
-            return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
-        if new_tile[1] == prev_best[1]: #If they both moved horizontal...
-            if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
-            if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
-        if new_tile[0] == prev_best[0]: #If they both moved vertical...
-            if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
+            return not prev_y == new_y
+        if previous_move_direction == self.VERTICAL and not new_y == best_y:
+            return not prev_x == new_x
+        if previous_move_direction == 0:
+            return not prev_y == new_y
+
+        #To make it here, both moves are on the same axis
+        if new_y == best_y: #If they both moved horizontal...
+            if direction[0] == 1 and new_x > best_x: #If we moved right and right is our direction, we moved towards our direction
                 return True
-            if direction[1] == -1 and new_tile[1] < prev_best[1]: #If we moved down and down is our direction, we moved towards our direction
+            if direction[0] == -1 and new_x < best_x: #If we moved left and left is our direction, we moved towards our direction
+                return True
+            return False
+        if new_x == best_x: #If they both moved vertical...
+            if direction[1] == 1 and new_y > best_y: #If we moved up and up is our direction, we moved towards our direction
+                return True
+            if direction[1] == -1 and new_y < best_y: #If we moved down and down is our direction, we moved towards our direction
                 return True
             return False
         return True
@@ -299,9 +306,9 @@ class ShortestPathFinder:
 
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                index = (28 - y - 1) * ARENA_SIZE + x
+                if not self.blocked[index] and not self.pathlength[index] == -1:
+                    self._print_justified(self.pathlength[index])
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -314,3 +321,296 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+class NavigationField(ShortestPathFinder):
+    """The pathing of every start location towards one set of end points on a fixed board
+
+    The field holds the path length of every pathable cell. Cells that can reach an end point
+    are measured from the end points, and every other pocket of pathable space is measured from
+    its own most ideal self destruct location, which is exactly what a unit starting in that pocket
+    would path towards. The 'next step' taken from a cell depends on the previous move direction,
+    so it is cached per cell and direction the first time a path walks through it.
+
+    A field can be kept up to date with set_blocked when a single location is blocked or unblocked.
+    Only the region whose path lengths actually change is recomputed, like a dynamic breadth first search,
+    so evaluating many single firewall placements does not require rebuilding the field each time.
+
+    Attributes :
+        * end_points (list): The end points units are trying to reach
+        * direction ([int, int]): The direction of the end points, see _get_direction_from_endpoints
+
+    """
+    EDGE_ROOT = CELL_COUNT
+
+    def __init__(self, blocked, end_points):
+        """Builds the field
+
+        Args:
+            * blocked: A blocked grid, as returned by get_blocked_grid
+            * end_points: The end points of the units, should be a list of edge locations
+
+        """
+        super().__init__()
+        self.initialized = True
+        self.blocked[:] = blocked
+        self.end_points = end_points
+        self.direction = tuple(self._get_direction_from_endpoints(end_points))
+        targets = [location_to_index(location) for location in end_points]
+        self._targets = [index for index in targets if index is not None]
+        self._target_set = set(self._targets)
+        # The pocket each pathable cell belongs to, EDGE_ROOT if it can reach the end points and its
+        # most ideal self destruct location otherwise. -1 for blocked cells
+        self._root = [-1] * CELL_COUNT
+        self._next_moves = [-1] * (3 * CELL_COUNT)
+        self._fill()
+
+    def copy(self):
+        """Copies the field, so it can be repaired with set_blocked without changing this one
+
+        Returns:
+            A new NavigationField with the same blocked grid and end points
+        """
+        field = NavigationField.__new__(NavigationField)
+        field.__dict__.update(self.__dict__)
+        field.blocked = self.blocked[:]
+        field.pathlength = self.pathlength[:]
+        field._visited = bytearray(CELL_COUNT)
+        field._root = self._root[:]
+        field._next_moves = self._next_moves[:]
+        return field
+
+    def _fill(self):
+        """Sets the path length of every pathable cell, pocket by pocket
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        root = self._root
+        if self._targets:
+            for index in self._validate(self._targets[0], self._targets):
+                if not blocked[index]:
+                    root[index] = self.EDGE_ROOT
+        for index in CELL_INDICES:
+            if not blocked[index] and pathlength[index] == -1:
+                self._fill_pockets([index])
+        for index in self._targets:
+            if blocked[index]:
+                pathlength[index] = -1
+
+    def _fill_pockets(self, seeds):
+        """Measures every pocket holding one of the seeds from its own most ideal location.
+        The pockets must not contain an end point.
+
+        Returns:
+            The cell indices that were given a pathlength
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        root = self._root
+        idealness = IDEALNESS[self.direction]
+        filled = []
+        seen = set()
+        for seed in seeds:
+            if blocked[seed] or seed in seen:
+                continue
+            pocket = [seed]
+            seen.add(seed)
+            most_ideal = seed
+            for index in pocket:
+                pathlength[index] = -1
+                if idealness[index] > idealness[most_ideal]:
+                    most_ideal = index
+                for neighbor in NEIGHBORS[index]:
+                    if not blocked[neighbor] and neighbor not in seen:
+                        seen.add(neighbor)
+                        pocket.append(neighbor)
+            for index in self._validate(most_ideal, self._targets):
+                root[index] = most_ideal
+            filled.extend(pocket)
+        return filled
+
+    def get_path(self, start_point):
+        """Gets the path a unit at the given location would take
+
+        Args:
+            start_point: The starting location of the unit
+
+        Returns:
+            A list of locations, or None if start_point is blocked or outside of the arena
+
+        """
+        start = location_to_index(start_point)
+        if start is None or self.blocked[start]:
+            return
+        return self._get_path(start_point, start, self.direction)
+
+    def get_trace(self, start_point, speed):
+        """Gets the path a unit at the given location would take, and the frames it spends on each location.
+        Units move once every time their speed adds up to a whole step, so a unit with speed 0.5 moves every other frame.
+        Frame 0 is the frame the unit spawns on.
+
+        Args:
+            * start_point: The starting location of the unit
+            * speed: The speed of the unit, see GameUnit.speed
+
+        Returns:
+            A tuple (path, enter_frames, leave_frames), where the unit arrives on path[i] on frame enter_frames[i]
+            and moves on, scores or self destructs on frame leave_frames[i]. A unit that reaches an end point
+            scores on the frame it arrives. None if start_point is blocked or outside of the arena, or speed is not positive
+        """
+        if speed <= 0:
+            return
+        path = self.get_path(start_point)
+        if path is None:
+            return
+        move_frames = []
+        frame = 0
+        progress = 0
+        moves = len(path) if location_to_index(path[-1]) not in self._target_set else len(path) - 1
+        while len(move_frames) < moves:
+            frame += 1
+            progress += speed
+            if progress >= 1:
+                progress -= 1
+                move_frames.append(frame)
+        enter_frames = [0] + move_frames[:len(path) - 1]
+        leave_frames = move_frames + [enter_frames[-1]] * (len(path) - moves)
+        return path, enter_frames, leave_frames
+
+    def set_blocked(self, location, blocked=True):
+        """Blocks or unblocks a single location and repairs the field around it
+
+        Args:
+            * location: The location that gained or lost a stationary unit
+            * blocked: True if the location now holds a stationary unit, False if it is now empty
+
+        Returns:
+            The number of cells whose path length or blocked state changed
+
+        """
+        index = location_to_index(location)
+        if index is None or bool(self.blocked[index]) == bool(blocked):
+            return 0
+        if blocked:
+            changed = self._block(index)
+        else:
+            changed = self._unblock(index)
+
+        next_moves = self._next_moves
+        for index in changed:
+            for cell in NEIGHBORS[index] + (index,):
+                next_moves[cell] = next_moves[CELL_COUNT + cell] = next_moves[2 * CELL_COUNT + cell] = -1
+        return len(changed)
+
+    def _block(self, blocked_index):
+        blocked = self.blocked
+        pathlength = self.pathlength
+        root = self._root
+        old_root = root[blocked_index]
+        old_pathlength = pathlength[blocked_index]
+        blocked[blocked_index] = 1
+        root[blocked_index] = -1
+        pathlength[blocked_index] = -1
+        if old_root != self.EDGE_ROOT:
+            # The pocket may have split and lost its most ideal location, so measure what is left of it again
+            return [blocked_index] + self._fill_pockets(NEIGHBORS[blocked_index])
+
+        # Find every cell that lost all of its shortest routes, layer by layer
+        affected = set()
+        processed = set()
+        candidates = [index for index in NEIGHBORS[blocked_index] if not blocked[index] and pathlength[index] == old_pathlength + 1]
+        for index in candidates:
+            if index in processed:
+                continue
+            processed.add(index)
+            supported_pathlength = pathlength[index] - 1
+            if supported_pathlength < 0:
+                continue
+            supported = False
+            for neighbor in NEIGHBORS[index]:
+                if not blocked[neighbor] and pathlength[neighbor] == supported_pathlength and neighbor not in affected:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected.add(index)
+            for neighbor in NEIGHBORS[index]:
+                if not blocked[neighbor] and pathlength[neighbor] == pathlength[index] + 1 and neighbor not in processed:
+                    candidates.append(neighbor)
+
+        # Measure the affected cells again from the cells around them that kept their path length
+        for index in affected:
+            pathlength[index] = -1
+        frontier = []
+        for index in affected:
+            best = -1
+            for neighbor in NEIGHBORS[index]:
+                if not blocked[neighbor] and neighbor not in affected and (best == -1 or pathlength[neighbor] + 1 < best):
+                    best = pathlength[neighbor] + 1
+            if best != -1:
+                pathlength[index] = best
+                heapq.heappush(frontier, (best, index))
+        while frontier:
+            current_pathlength, index = heapq.heappop(frontier)
+            if current_pathlength != pathlength[index]:
+                continue
+            for neighbor in NEIGHBORS[index]:
+                if neighbor in affected and (pathlength[neighbor] == -1 or pathlength[neighbor] > current_pathlength + 1):
+                    pathlength[neighbor] = current_pathlength + 1
+                    heapq.heappush(frontier, (current_pathlength + 1, neighbor))
+
+        # Anything left unreached was cut off from the end points and becomes its own pocket
+        cut_off = [index for index in affected if pathlength[index] == -1]
+        return [blocked_index] + list(affected) + self._fill_pockets(cut_off)
+
+    def _unblock(self, unblocked_index):
+        blocked = self.blocked
+        pathlength = self.pathlength
+        root = self._root
+        blocked[unblocked_index] = 0
+        neighbors = [index for index in NEIGHBORS[unblocked_index] if not blocked[index]]
+        reaches_edge = unblocked_index in self._target_set or any(root[index] == self.EDGE_ROOT for index in neighbors)
+        if not reaches_edge:
+            # Pockets are merging, measure the merged pocket from its new most ideal location
+            return self._fill_pockets([unblocked_index])
+
+        changed = [unblocked_index]
+        # Pockets joining the edge region are measured again from the unblocked cell
+        merged_roots = set(root[index] for index in neighbors) - {self.EDGE_ROOT}
+        for index in neighbors:
+            if root[index] in merged_roots:
+                pocket = [index]
+                pathlength[index] = -1
+                for cell in pocket:
+                    for neighbor in NEIGHBORS[cell]:
+                        if not blocked[neighbor] and root[neighbor] in merged_roots and pathlength[neighbor] != -1:
+                            pathlength[neighbor] = -1
+                            pocket.append(neighbor)
+                for cell in pocket:
+                    root[cell] = self.EDGE_ROOT
+                changed.extend(pocket)
+
+        root[unblocked_index] = self.EDGE_ROOT
+        if unblocked_index in self._target_set:
+            pathlength[unblocked_index] = 0
+        else:
+            pathlength[unblocked_index] = min(pathlength[index] for index in neighbors if pathlength[index] != -1) + 1
+        # Propagate shorter path lengths outwards from the unblocked cell
+        current = [unblocked_index]
+        for index in current:
+            next_pathlength = pathlength[index] + 1
+            for neighbor in NEIGHBORS[index]:
+                if not blocked[neighbor] and (pathlength[neighbor] == -1 or pathlength[neighbor] > next_pathlength):
+                    pathlength[neighbor] = next_pathlength
+                    root[neighbor] = self.EDGE_ROOT
+                    current.append(neighbor)
+                    changed.append(neighbor)
+        return changed
+
+    def _choose_next_move(self, current_point, previous_move_direction, direction):
+        key = previous_move_direction * CELL_COUNT + current_point
+        next_move = self._next_moves[key]
+        if next_move == -1:
+            next_move = super()._choose_next_move(current_point, previous_move_direction, direction)
+            self._next_moves[key] = next_move
+        return next_move
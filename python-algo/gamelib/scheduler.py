@@ -0,0 +1,129 @@
+"""
+Helps a strategy use the time it has each turn without going over it.
+
+A turn has a soft time limit, waitTimeBotSoft in the config, counted from when the engine sends the
+turn message. A TurnScheduler starts its clock when that message was read, runs the strategy's
+improvement steps until a safety margin before the limit, and then submits the best plan found.
+"""
+import time
+import traceback
+
+from .util import debug_write
+
+DEFAULT_TURN_BUDGET = 5.0
+
+
+def get_turn_budget(config):
+    """Gets how many seconds a turn may take before going over the soft time limit
+
+    Args:
+        config: The game config
+
+    Returns:
+        The soft time limit of a turn in seconds
+    """
+    timing = config.get("timingAndReplay", {}) if config else {}
+    return timing.get("waitTimeBotSoft", DEFAULT_TURN_BUDGET * 1000) / 1000
+
+
+class TurnScheduler:
+    """Runs improvement steps until a deadline, then submits the best plan found
+
+    A step is an iterator, usually a generator, that yields (score, game_state) pairs, where game_state holds
+    the spawn commands of a plan, like a fork of the turn's game state, and higher scores are better.
+    Steps are advanced in turn, one item at a time, so every step gets a share of the time. A step is not started
+    again when the time left is less than the longest it has taken so far, so keep each item of a step short.
+    Python can not interrupt a running step, so the safety margin has to cover one unexpectedly slow item.
+
+    Attributes :
+        * deadline (float): When the best plan is submitted, as a time.perf_counter() value
+        * best_score: The score of the best plan so far, None if no plan was offered
+        * best_state (GameState): The best plan so far
+        * steps_run (int): How many items the steps have yielded
+
+    """
+    def __init__(self, budget, safety_margin=0.5, started_at=None):
+        """Starts the clock
+
+        Args:
+            budget: How many seconds the turn may take
+            safety_margin: How many seconds before the end of the budget the plan is submitted
+            started_at: When the turn started as a time.perf_counter() value, now if None
+
+        """
+        if started_at is None:
+            started_at = time.perf_counter()
+        self.deadline = started_at + budget - safety_margin
+        self.best_score = None
+        self.best_state = None
+        self.steps_run = 0
+        self.__steps = []
+
+    def time_left(self):
+        """Gets the time left before the plan is submitted
+
+        Returns:
+            The time left in seconds, negative once the deadline has passed
+        """
+        return self.deadline - time.perf_counter()
+
+    def expired(self):
+        """Checks if the deadline has passed
+
+        Returns:
+            True if there is no time left
+        """
+        return self.time_left() <= 0
+
+    def add_step(self, step):
+        """Registers an improvement step
+
+        Args:
+            step: An iterable yielding (score, game_state) pairs
+        """
+        self.__steps.append([iter(step), 0.0])
+
+    def offer(self, score, game_state):
+        """Offers a plan, which becomes the best plan if its score is higher than every plan before it
+
+        Args:
+            score: The score of the plan, higher is better
+            game_state: The game state holding the plan's spawn commands
+        """
+        if self.best_score is None or score > self.best_score:
+            self.best_score = score
+            self.best_state = game_state
+
+    def run(self, game_state):
+        """Runs the steps until they are all finished or the deadline is near, then submits the best plan
+
+        Args:
+            game_state: The plan submitted if no step offers one, usually the turn's game state
+
+        Returns:
+            The game state that was submitted
+        """
+        if self.best_state is None:
+            self.best_state = game_state
+        steps = self.__steps
+        while steps:
+            for step in list(steps):
+                time_left = self.time_left()
+                if time_left <= step[1]:
+                    steps.remove(step)
+                    continue
+                started = time.perf_counter()
+                try:
+                    score, plan = next(step[0])
+                except StopIteration:
+                    steps.remove(step)
+                    continue
+                except Exception:
+                    debug_write("Turn scheduler step failed: {}".format(traceback.format_exc()))
+                    steps.remove(step)
+                    continue
+                step[1] = max(step[1], time.perf_counter() - started)
+                self.steps_run += 1
+                self.offer(score, plan)
+        self.best_state.submit_turn()
+        return self.best_state
@@ -0,0 +1,933 @@
+"""
+A frame by frame simulator of the action phase, for trying out deploys without the game engine.
+
+The simulator reads the stationary units of a GameState and spawns both players' deploys on top of them.
+Each frame, mobile units whose turn it is take a step along the GameState's cached navigation fields,
+encryptors shield the friendly units that come into range, every unit attacks the target GameState.get_target
+would choose, and dead units are removed. Units that reach their target edge score a breach, and units
+that can not move any further self destruct. When a firewall dies, the fields are repaired around it
+so the remaining units reroute, like the engine does when rerouteMidRound is on.
+
+Everything is kept in flat tables indexed by cell index, and the board is never changed until the
+end of the turn, so a simulation costs little more than the frames it steps through.
+"""
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .geometry import ARENA_SIZE, HALF_ARENA, CELL_COUNT, CELL_X, CELL_Y, CELL_INDICES, IN_BOUNDS, EDGE_OF, location_to_index
+from .game_map import _get_range_offsets, _get_disk
+from .unit import get_unit_stats
+
+_HORIZONTAL = 1
+_VERTICAL = 2
+# Marks locations where units self destruct in the next move tables of the NumPy batch simulation
+_SELF_DESTRUCT = -2
+
+"""
+The outcome of a simulated action phase.
+game_state is a new GameState holding the board, health and resources at the end of the turn.
+frame_count is the number of frames the action phase lasted. breaches and damage_dealt are indexed by player_index,
+and hold the number of units that player scored with and the total damage its units dealt to enemy units.
+"""
+SimulationResult = namedtuple("SimulationResult", ["game_state", "frame_count", "breaches", "damage_dealt"])
+
+"""
+The outcome of simulating a batch of deploy plans with BatchSimulator.run. Each field is an array indexed by candidate:
+the number of units that scored, the total damage dealt to enemy firewalls, and the number of frames the action phase lasted.
+"""
+BatchResult = namedtuple("BatchResult", ["breaches", "damage_dealt", "frame_counts"])
+
+# Maps (radius, get hit radius) to the set of in range offsets
+_OFFSET_SETS = {}
+
+
+def _expand(starts, counts, rows):
+    """
+    Pairs every row of a flattened table with each of its entries, for the NumPy batch simulation.
+    Returns which of rows each pair belongs to and the position of its entry, rows first and entries in table order
+    """
+    row_counts = counts[rows]
+    owners = np.repeat(np.arange(len(rows)), row_counts)
+    positions = np.arange(len(owners)) + np.repeat(starts[rows] - (np.cumsum(row_counts) - row_counts), row_counts)
+    return owners, positions
+
+
+def _group_winners(groups, group_count, keys):
+    """
+    The positions of the entry with the lowest keys in every group, for the NumPy batch simulation.
+    Keys are compared in order like tuples, and entries that tie on every key go to the first one
+    """
+    positions = np.arange(len(groups))
+    for key in keys + [positions]:
+        key = key[positions]
+        best = np.full(group_count, np.inf)
+        np.minimum.at(best, groups, key)
+        kept = key == best[groups]
+        positions, groups = positions[kept], groups[kept]
+    return positions
+
+
+def _get_offset_set(radius, hit_radius):
+    key = (radius, hit_radius)
+    offsets = _OFFSET_SETS.get(key)
+    if offsets is None:
+        offsets = _OFFSET_SETS[key] = frozenset(_get_range_offsets(radius, hit_radius))
+    return offsets
+
+
+class SimulatedUnit:
+    """A unit taking part in a simulation
+
+    Attributes :
+        * unit_type (string): The unit's type
+        * player_index (int): The player controlling the unit
+        * stats (UnitStats): The stats of the unit's type and upgrade level
+        * index (int): The cell index of the unit's location
+        * health (float): The unit's current health, including shields
+        * alive (bool): False once the unit died, breached or self destructed
+        * pending_removal (bool): If this firewall is removed by its owner at the end of the turn
+        * target_edge (int): The edge a mobile unit is trying to reach
+        * steps (int): The number of steps a mobile unit has taken
+    """
+    __slots__ = ("unit_type", "player_index", "stats", "index", "health", "alive", "pending_removal",
+                 "target_edge", "steps", "_progress", "_direction", "_shielded_by")
+
+    def __init__(self, unit_type, player_index, stats, index, health):
+        self.unit_type = unit_type
+        self.player_index = player_index
+        self.stats = stats
+        self.index = index
+        self.health = health
+        self.alive = True
+        self.pending_removal = False
+        self.target_edge = None
+        self.steps = 0
+        self._progress = 0
+        self._direction = 0
+        self._shielded_by = None
+
+    @property
+    def x(self):
+        return CELL_X[self.index]
+
+    @property
+    def y(self):
+        return CELL_Y[self.index]
+
+
+class ActionSimulator:
+    """Simulates the action phase that follows a GameState's turn
+
+    Create one simulator per hypothetical action phase, then call run, or step to watch it frame by frame.
+    The GameState is only read, so one game state can be simulated against many different deploys.
+    The navigation fields of the game state are shared until a firewall dies, and copied then.
+
+    Shields are added to a unit's health and do not decay. Deploy costs are not charged, since
+    attempt_spawn already paid for your own units.
+
+    Attributes :
+        * game_state (:obj: GameState): The game state being simulated
+        * frame (int): The number of frames simulated so far
+        * stationary_units (list): The SimulatedUnits of both players' firewalls, including dead ones
+        * mobile_units (list): The SimulatedUnits of both players' information units still on the board
+        * health ([float, float]): Each player's remaining health
+        * cores ([float, float]): Each player's cores, including cores gained by breaching
+        * breaches ([int, int]): The number of units each player scored with
+        * damage_dealt ([float, float]): The damage each player's units dealt to enemy units
+
+    """
+    def __init__(self, game_state, my_deploys=None, enemy_deploys=None):
+        """Reads the firewalls of a game state and spawns the deploys
+
+        Args:
+            * game_state: The GameState whose board is simulated. Its mobile units are ignored
+            * my_deploys: Your information units as (unit_type, x, y) tuples, like the spawn commands of
+              attempt_spawn. Defaults to the units you already spawned on game_state
+            * enemy_deploys: Your opponent's information units as (unit_type, x, y) tuples
+
+        """
+        self.game_state = game_state
+        self.config = game_state.config
+        self.frame = 0
+        self.health = [game_state.my_health, game_state.enemy_health]
+        self.cores = [game_state.get_resource(game_state.CORES, 0), game_state.get_resource(game_state.CORES, 1)]
+        self.breaches = [0, 0]
+        self.damage_dealt = [0, 0]
+        self._hit_radius = self.config["unitInformation"][0].get('getHitRadius', 0)
+        self._reroute = self.config.get("mechanics", {}).get("rerouteMidRound", True)
+        self._fields = {}
+        self._owned_fields = set()
+        self._unblocked = []
+
+        game_map = game_state.game_map
+        self.stationary_units = []
+        self._stationary = [None] * len(IN_BOUNDS)
+        blocked = game_map.get_blocked_grid()
+        for index in range(len(blocked)):
+            if not blocked[index]:
+                continue
+            for unit in game_map[CELL_X[index], CELL_Y[index]]:
+                if unit.stationary:
+                    simulated = SimulatedUnit(unit.unit_type, unit.player_index, unit.stats, index, unit.health)
+                    simulated.pending_removal = unit.pending_removal
+                    self.stationary_units.append(simulated)
+                    self._stationary[index] = simulated
+
+        self._attackers = [unit for unit in self.stationary_units if unit.stats.damage_i > 0 or unit.stats.damage_f > 0]
+
+        # Maps cell index to the friendly encryptors whose shields reach it, per player
+        self._shielders = [{}, {}]
+        for unit in self.stationary_units:
+            if unit.stats.shieldPerUnit <= 0:
+                continue
+            height = unit.y if unit.player_index == 0 else ARENA_SIZE - 1 - unit.y
+            amount = unit.stats.shieldPerUnit + unit.stats.shield_bonus_per_y * height
+            shielders = self._shielders[unit.player_index]
+            for cell in _get_disk(unit.index, unit.stats.shieldRange, self._hit_radius):
+                shielders.setdefault(cell, []).append((unit, amount))
+
+        self.mobile_units = []
+        self._mobile = [[], []]
+        if my_deploys is None:
+            my_deploys = game_state._deploy_stack
+        for player_index, deploys in enumerate([my_deploys, enemy_deploys or []]):
+            for unit_type, x, y in deploys:
+                self.spawn(unit_type, [x, y], player_index)
+
+    def spawn(self, unit_type, location, player_index):
+        """Adds an information unit to the simulation
+
+        Args:
+            * unit_type: The type of the unit
+            * location: The location the unit starts at
+            * player_index: The player controlling the unit
+
+        Returns:
+            The new SimulatedUnit, or None if the location is blocked or outside of the arena
+        """
+        index = location_to_index(location)
+        if index is None or self._stationary[index] is not None:
+            return
+        stats = get_unit_stats(self.config, unit_type)
+        unit = SimulatedUnit(unit_type, player_index, stats, index, stats.max_health)
+        unit.target_edge = self.game_state.get_target_edge(location)
+        unit._shielded_by = set()
+        self.mobile_units.append(unit)
+        self._mobile[player_index].append(unit)
+        return unit
+
+    def run(self, max_frames=2000):
+        """Steps the simulation until no information units are left
+
+        Args:
+            max_frames: The most frames to simulate, in case units are stuck
+
+        Returns:
+            A SimulationResult
+        """
+        while self.mobile_units and self.frame < max_frames:
+            self.step()
+        return SimulationResult(self.get_end_state(), self.frame, list(self.breaches), list(self.damage_dealt))
+
+    def step(self):
+        """Simulates one frame: movement, shields, attacks and then deaths
+
+        Returns:
+            True if information units are still on the board
+        """
+        self.frame += 1
+        dead = []
+        for unit in self.mobile_units:
+            unit._progress += unit.stats.speed
+            if unit._progress >= 1:
+                unit._progress -= 1
+                self._move(unit, dead)
+
+        for unit in self.mobile_units:
+            if not unit.alive:
+                continue
+            for encryptor, amount in self._shielders[unit.player_index].get(unit.index, ()):
+                if encryptor.alive and encryptor.index not in unit._shielded_by:
+                    unit._shielded_by.add(encryptor.index)
+                    unit.health += amount
+
+        attacks = []
+        for attackers in (self._attackers, self.mobile_units):
+            for attacker in attackers:
+                if attacker.alive:
+                    target = self.get_target(attacker)
+                    if target is not None:
+                        attacks.append((attacker, target))
+        for attacker, target in attacks:
+            self._damage(target, attacker.stats.damage_f if target.stats.stationary else attacker.stats.damage_i, attacker.player_index)
+
+        for units in (self.stationary_units, self.mobile_units):
+            for unit in units:
+                if unit.alive and unit.health <= 0:
+                    dead.append(unit)
+        for unit in dead:
+            self._remove(unit)
+        if dead:
+            self.mobile_units = [unit for unit in self.mobile_units if unit.alive]
+            self._mobile = [[unit for unit in units if unit.alive] for units in self._mobile]
+        return bool(self.mobile_units)
+
+    def get_target(self, attacker):
+        """Gets the unit an attacker would choose to attack this frame, with the priorities of GameState.get_target
+
+        Args:
+            attacker: A SimulatedUnit
+
+        Returns:
+            The SimulatedUnit it attacks, or None
+        """
+        stats = attacker.stats
+        x, y = CELL_X[attacker.index], CELL_Y[attacker.index]
+        lowest_y = attacker.player_index == 0
+        target = None
+        target_key = None
+        # Information units are always preferred over firewalls, so firewalls are only looked at without one in range
+        if stats.damage_i > 0:
+            in_range = _get_offset_set(stats.attackRange, self._hit_radius)
+            for unit in self._mobile[1 - attacker.player_index]:
+                if not unit.alive:
+                    continue
+                unit_x, unit_y = CELL_X[unit.index], CELL_Y[unit.index]
+                dx, dy = unit_x - x, unit_y - y
+                if (dx, dy) not in in_range:
+                    continue
+                key = (dx * dx + dy * dy, unit.health, unit_y if lowest_y else -unit_y, -abs(HALF_ARENA - 0.5 - unit_x))
+                if target is None or key < target_key:
+                    target = unit
+                    target_key = key
+            if target is not None:
+                return target
+        if stats.damage_f > 0:
+            stationary = self._stationary
+            for cell in _get_disk(attacker.index, stats.attackRange, self._hit_radius):
+                unit = stationary[cell]
+                if unit is None or unit.player_index == attacker.player_index:
+                    continue
+                unit_x, unit_y = CELL_X[cell], CELL_Y[cell]
+                dx, dy = unit_x - x, unit_y - y
+                key = (dx * dx + dy * dy, unit.health, unit_y if lowest_y else -unit_y, -abs(HALF_ARENA - 0.5 - unit_x))
+                if target is None or key < target_key:
+                    target = unit
+                    target_key = key
+        return target
+
+    def get_end_state(self):
+        """Applies the simulated action phase to a fork of the game state.
+        Dead firewalls and firewalls pending removal are taken off the board, damaged firewalls keep their
+        health, the information units you spawned are gone, and health and cores reflect breaches and refunds.
+
+        Returns:
+            A new GameState
+        """
+        state = self.game_state.fork()
+        game_map = state.game_map
+        cores = list(self.cores)
+        for unit in self.stationary_units:
+            location = [unit.x, unit.y]
+            if not unit.alive or unit.pending_removal:
+                if unit.alive:
+                    cores[unit.player_index] += unit.stats.cost[0] * unit.stats.refund * min(1, unit.health / unit.stats.max_health)
+                game_map.remove_unit(location)
+                continue
+            existing = game_map[location][0]
+            if existing.health != unit.health:
+                existing.health = unit.health
+                game_map[location[0], location[1]] = [existing]
+        for unit_type, x, y in state._deploy_stack:
+            units = game_map[x, y]
+            if units and not units[0].stationary:
+                game_map.remove_unit([x, y])
+
+        state.my_health, state.enemy_health = self.health
+        state._player_resources[0]['cores'], state._player_resources[1]['cores'] = cores
+        state._build_stack = []
+        state._deploy_stack = []
+        return state
+
+    def _field(self, edge):
+        field = self._fields.get(edge)
+        if field is None:
+            field = self.game_state.get_navigation_field(edge)
+            if self._unblocked:
+                field = field.copy()
+                for location in self._unblocked:
+                    field.set_blocked(location, False)
+                self._owned_fields.add(edge)
+            self._fields[edge] = field
+        return field
+
+    def _move(self, unit, dead):
+        field = self._field(unit.target_edge)
+        current = unit.index
+        if field.pathlength[current] == 0:
+            self._self_destruct(unit)
+            dead.append(unit)
+            return
+        next_move = field._choose_next_move(current, unit._direction, field.direction)
+        unit._direction = _VERTICAL if CELL_X[current] == CELL_X[next_move] else _HORIZONTAL
+        unit.index = next_move
+        unit.steps += 1
+        if EDGE_OF[next_move] == unit.target_edge:
+            stats = unit.stats
+            self.health[1 - unit.player_index] -= stats.breach_damage
+            self.cores[unit.player_index] += stats.breach_cores
+            self.breaches[unit.player_index] += 1
+            unit.alive = False
+            dead.append(unit)
+
+    def _self_destruct(self, unit):
+        unit.alive = False
+        stats = unit.stats
+        if unit.steps < stats.self_destruct_steps:
+            return
+        enemy = 1 - unit.player_index
+        disk = _get_disk(unit.index, stats.self_destruct_range, self._hit_radius)
+        for cell in disk:
+            target = self._stationary[cell]
+            if target is not None and target.player_index == enemy:
+                self._damage(target, stats.self_destruct_damage_f, unit.player_index)
+        in_range = set(disk)
+        for target in self._mobile[enemy]:
+            if target.alive and target.index in in_range:
+                self._damage(target, stats.self_destruct_damage_i, unit.player_index)
+
+    def _damage(self, target, damage, player_index):
+        if damage <= 0 or not target.alive:
+            return
+        self.damage_dealt[player_index] += min(damage, max(target.health, 0))
+        target.health -= damage
+
+    def _remove(self, unit):
+        unit.alive = False
+        if not unit.stats.stationary:
+            return
+        self._stationary[unit.index] = None
+        if not self._reroute:
+            return
+        location = [unit.x, unit.y]
+        self._unblocked.append(location)
+        for edge, field in self._fields.items():
+            if edge not in self._owned_fields:
+                field = self._fields[edge] = field.copy()
+                self._owned_fields.add(edge)
+            field.set_blocked(location, False)
+
+
+class BatchSimulator:
+    """Simulates many candidate deploy plans of one player against the same defending board
+
+    The firewalls of the game state are read once, and the tables every candidate needs are built once:
+    which defending attackers cover each location, which defending firewalls each attacker could hit,
+    and which friendly encryptors shield each location. Units are kept in arrays indexed by
+    [candidate * units per candidate + unit] for positions, health and progress, and firewalls in arrays
+    indexed by [candidate * firewall count + firewall]. The candidates share the game state's navigation
+    fields, and a candidate only gets its own copy once one of its firewalls dies.
+
+    When NumPy is installed, run advances every candidate at once: each frame, movement, shields, targeting
+    and damage are array operations over the units of all candidates, and targets are picked by sorting
+    the (unit, attacker) pairs in range by their priority. Without NumPy, the candidates are stepped one
+    after another with the same rules.
+
+    The rules are those of ActionSimulator, with only the attacking player deploying units,
+    so the breaches and damage of each candidate match an ActionSimulator run of the same deploys.
+
+    Attributes :
+        * game_state (:obj: GameState): The game state being simulated
+        * player_index (int): The player whose deploy plans are simulated
+
+    """
+    def __init__(self, game_state, player_index=0):
+        """Reads the firewalls of a game state
+
+        Args:
+            * game_state: The GameState whose board is simulated. Its mobile units are ignored
+            * player_index: The player deploying the candidate plans, 0 for you 1 for the enemy
+
+        """
+        self.game_state = game_state
+        self.player_index = player_index
+        self.config = game_state.config
+        self._hit_radius = self.config["unitInformation"][0].get('getHitRadius', 0)
+        self._reroute = self.config.get("mechanics", {}).get("rerouteMidRound", True)
+        defender = 1 - player_index
+
+        game_map = game_state.game_map
+        self._firewall_cells = []
+        self._firewall_stats = []
+        self._firewall_players = []
+        self._firewall_health = array('d')
+        self._firewall_at = [-1] * len(IN_BOUNDS)
+        blocked = game_map.get_blocked_grid()
+        for index in range(len(blocked)):
+            if not blocked[index]:
+                continue
+            for unit in game_map[CELL_X[index], CELL_Y[index]]:
+                if unit.stationary:
+                    self._firewall_at[index] = len(self._firewall_cells)
+                    self._firewall_cells.append(index)
+                    self._firewall_stats.append(unit.stats)
+                    self._firewall_players.append(unit.player_index)
+                    self._firewall_health.append(unit.health)
+
+        # Maps cell index to (firewall, squared distance) of the defending attackers covering it,
+        # and to (firewall, shield amount) of the attacking player's encryptors
+        self._attack_cover = {}
+        self._shield_cover = {}
+        for firewall, index in enumerate(self._firewall_cells):
+            stats = self._firewall_stats[firewall]
+            owner = self._firewall_players[firewall]
+            if owner == defender and stats.damage_i > 0:
+                for cell in _get_disk(index, stats.attackRange, self._hit_radius):
+                    dx, dy = CELL_X[cell] - CELL_X[index], CELL_Y[cell] - CELL_Y[index]
+                    self._attack_cover.setdefault(cell, []).append((firewall, dx * dx + dy * dy))
+            if owner == player_index and stats.shieldPerUnit > 0:
+                height = CELL_Y[index] if owner == 0 else ARENA_SIZE - 1 - CELL_Y[index]
+                amount = stats.shieldPerUnit + stats.shield_bonus_per_y * height
+                for cell in _get_disk(index, stats.shieldRange, self._hit_radius):
+                    self._shield_cover.setdefault(cell, []).append((firewall, amount))
+        # Maps (cell index, radius) to the defending firewalls in range, with their target keys besides health
+        self._firewall_targets = {}
+        # Maps radius to _firewall_targets of every cell flattened into arrays, for the NumPy simulation
+        self._target_tables = {}
+
+    def _get_firewall_targets(self, index, radius):
+        key = (index, radius)
+        targets = self._firewall_targets.get(key)
+        if targets is None:
+            targets = []
+            lowest_y = self.player_index == 0
+            for cell in _get_disk(index, radius, self._hit_radius):
+                firewall = self._firewall_at[cell]
+                if firewall == -1 or self._firewall_players[firewall] == self.player_index:
+                    continue
+                dx, dy = CELL_X[cell] - CELL_X[index], CELL_Y[cell] - CELL_Y[index]
+                targets.append((firewall, dx * dx + dy * dy, CELL_Y[cell] if lowest_y else -CELL_Y[cell],
+                                -abs(HALF_ARENA - 0.5 - CELL_X[cell])))
+            targets = self._firewall_targets[key] = tuple(targets)
+        return targets
+
+    def run(self, plans, max_frames=2000):
+        """Simulates every plan against the board
+
+        Args:
+            * plans: A list of deploy plans, each a list of (unit_type, x, y) tuples like the spawn commands of attempt_spawn
+            * max_frames: The most frames to simulate, in case units are stuck
+
+        Returns:
+            A BatchResult
+        """
+        if np is not None:
+            return self._run_vectorized(plans, max_frames)
+        return self._run_serial(plans, max_frames)
+
+    def _get_target_table(self, radius):
+        """
+        The defending firewalls in range of every cell: the first entry and number of entries of each cell,
+        then the firewall, squared distance, y key and x key of every entry, in _get_firewall_targets order
+        """
+        table = self._target_tables.get(radius)
+        if table is None:
+            offsets = np.array(_get_range_offsets(radius, self._hit_radius), dtype=np.int64).reshape(-1, 2)
+            x = np.array(CELL_X)[:, None] + offsets[:, 0]
+            y = np.array(CELL_Y)[:, None] + offsets[:, 1]
+            in_arena = (x >= 0) & (x < ARENA_SIZE) & (y >= 0) & (y < ARENA_SIZE)
+            target_cells = np.where(in_arena, y * ARENA_SIZE + x, 0)
+            firewall_at = np.array(self._firewall_at + [-1], dtype=np.int64)
+            firewalls = firewall_at[np.where(in_arena, target_cells, CELL_COUNT)]
+            firewall_players = np.array(self._firewall_players + [self.player_index], dtype=np.int64)
+            # Rows of cells that are out of bounds stay empty, like the cells a unit can never stand on
+            is_target = (firewalls != -1) & (firewall_players[firewalls] != self.player_index)
+            is_target &= np.frombuffer(IN_BOUNDS, dtype=np.uint8).astype(bool)[:, None]
+            counts = is_target.sum(axis=1)
+            starts = np.cumsum(counts) - counts
+            target_x, target_y = x[is_target], y[is_target]
+            distances = (offsets[:, 0] ** 2 + offsets[:, 1] ** 2)[None, :].repeat(CELL_COUNT, axis=0)[is_target]
+            y_keys = target_y if self.player_index == 0 else -target_y
+            table = self._target_tables[radius] = (starts, counts, firewalls[is_target], distances.astype(np.float64),
+                                                   y_keys.astype(np.float64), -np.abs(HALF_ARENA - 0.5 - target_x))
+        return table
+
+    def _run_vectorized(self, plans, max_frames):
+        game_state = self.game_state
+        config = self.config
+        candidate_count = len(plans)
+        firewall_count = len(self._firewall_cells)
+        firewall_at = self._firewall_at
+        defender = 1 - self.player_index
+        lowest_y = defender == 0
+        width = max([len(plan) for plan in plans] + [1])
+        size = candidate_count * width
+
+        cells = np.zeros(size, dtype=np.int64)
+        health = np.zeros(size)
+        progress = np.zeros(size)
+        steps = np.zeros(size, dtype=np.int64)
+        directions = np.zeros(size, dtype=np.int64)
+        edges = np.zeros(size, dtype=np.int64)
+        types = np.zeros(size, dtype=np.int64)
+        alive = np.zeros(size, dtype=bool)
+        type_stats = []
+        type_indices = {}
+        for candidate, plan in enumerate(plans):
+            unit = candidate * width
+            for unit_type, x, y in plan:
+                index = location_to_index([x, y])
+                if index is None or firewall_at[index] != -1:
+                    continue
+                unit_stats = get_unit_stats(config, unit_type)
+                if unit_stats not in type_indices:
+                    type_indices[unit_stats] = len(type_stats)
+                    type_stats.append(unit_stats)
+                cells[unit] = index
+                health[unit] = unit_stats.max_health
+                edges[unit] = game_state.get_target_edge([x, y])
+                types[unit] = type_indices[unit_stats]
+                alive[unit] = True
+                unit += 1
+        speeds = np.array([unit_stats.speed for unit_stats in type_stats] or [0.0])
+
+        # Sets of navigation fields, one per set of destroyed firewalls, starting with the game state's fields.
+        # Candidates that destroyed the same firewalls share the same fields, in any order they destroyed them.
+        # Next moves are indexed by [field set, edge slot, previous direction, cell] and filled in the first time
+        # a unit needs them, -1 until then and _SELF_DESTRUCT where the unit can not move any further
+        used_edges = sorted(set(edges[alive].tolist()))
+        edge_slots = np.zeros(4, dtype=np.int64)
+        edge_slots[used_edges] = np.arange(len(used_edges))
+        field_sets = [[game_state.get_navigation_field(edge) for edge in used_edges]]
+        destroyed_sets = [frozenset()]
+        field_set_indices = {frozenset(): 0}
+        candidate_sets = np.zeros(candidate_count, dtype=np.int64)
+        next_moves = np.full((1, max(len(used_edges), 1), 3, CELL_COUNT), -1, dtype=np.int16)
+
+        cell_x = np.array(CELL_X)
+        edge_of = np.array(EDGE_OF)
+        # The parts of the defenders' target keys that only depend on the cell of the unit
+        y_keys = np.array(CELL_Y, dtype=np.float64) * (1 if lowest_y else -1)
+        x_keys = -np.abs(HALF_ARENA - 0.5 - cell_x)
+
+        def flatten(cover):
+            starts = np.zeros(CELL_COUNT, dtype=np.int64)
+            counts = np.zeros(CELL_COUNT, dtype=np.int64)
+            entries = []
+            for cell in sorted(cover):
+                starts[cell] = len(entries)
+                counts[cell] = len(cover[cell])
+                entries.extend(cover[cell])
+            columns = np.array(entries, dtype=np.float64).reshape(-1, 2)
+            return starts, counts, columns[:, 0].astype(np.int64), columns[:, 1]
+        cover_starts, cover_counts, cover_firewalls, cover_distances = flatten(self._attack_cover)
+        shield_starts, shield_counts, shield_firewalls, shield_amounts = flatten(self._shield_cover)
+        encryptors = np.unique(shield_firewalls)
+        shield_encryptors = np.searchsorted(encryptors, shield_firewalls)
+        shielded = np.zeros((size, len(encryptors)), dtype=bool)
+        damage_i = np.array([firewall_stats.damage_i for firewall_stats in self._firewall_stats] or [0.0])
+
+        firewall_health = np.tile(np.array(self._firewall_health, dtype=np.float64), candidate_count)
+        firewall_alive = np.ones(candidate_count * firewall_count, dtype=bool)
+        breaches = np.zeros(candidate_count, dtype=np.int64)
+        damage_dealt = np.zeros(candidate_count)
+        frame_counts = np.zeros(candidate_count, dtype=np.int64)
+        live_counts = np.bincount(np.flatnonzero(alive) // width, minlength=candidate_count)
+
+        frame = 0
+        while frame < max_frames:
+            units = np.flatnonzero(alive)
+            if not len(units):
+                break
+            frame += 1
+            hit_firewalls = []
+            hit_damages = []
+
+            unit_progress = progress[units] + speeds[types[units]]
+            moving = unit_progress >= 1
+            progress[units] = np.where(moving, unit_progress - 1, unit_progress)
+            movers = units[moving]
+            current = cells[movers]
+            sets = candidate_sets[movers // width]
+            mover_edges = edges[movers]
+            previous = directions[movers]
+            slots = edge_slots[mover_edges]
+            next_cells = next_moves[sets, slots, previous, current].astype(np.int64)
+            missing = np.flatnonzero(next_cells < 0)
+            if len(missing):
+                keys = (sets[missing], slots[missing], previous[missing], current[missing])
+                found = []
+                for field_set, slot, direction, cell in zip(*(key.tolist() for key in keys)):
+                    field = field_sets[field_set][slot]
+                    if field.pathlength[cell] == 0:
+                        found.append(_SELF_DESTRUCT)
+                    else:
+                        found.append(field._choose_next_move(cell, direction, field.direction))
+                next_cells[missing] = next_moves[keys] = found
+            stuck = next_cells == _SELF_DESTRUCT
+            if stuck.any():
+                destructed = movers[stuck]
+                alive[destructed] = False
+                for type_index, unit_stats in enumerate(type_stats):
+                    if unit_stats.self_destruct_damage_f <= 0:
+                        continue
+                    exploding = destructed[(types[destructed] == type_index) & (steps[destructed] >= unit_stats.self_destruct_steps)]
+                    if not len(exploding):
+                        continue
+                    starts, counts, firewalls = self._get_target_table(unit_stats.self_destruct_range)[:3]
+                    owners, positions = _expand(starts, counts, cells[exploding])
+                    targets = (exploding[owners] // width) * firewall_count + firewalls[positions]
+                    targets = targets[firewall_alive[targets]]
+                    hit_firewalls.append(targets)
+                    hit_damages.append(np.full(len(targets), float(unit_stats.self_destruct_damage_f)))
+                movers, current, mover_edges, next_cells = movers[~stuck], current[~stuck], mover_edges[~stuck], next_cells[~stuck]
+
+            directions[movers] = np.where(cell_x[current] == cell_x[next_cells], _VERTICAL, _HORIZONTAL)
+            cells[movers] = next_cells
+            steps[movers] += 1
+            scored = edge_of[next_cells] == mover_edges
+            if scored.any():
+                alive[movers[scored]] = False
+                breaches += np.bincount(movers[scored] // width, minlength=candidate_count)
+            units = units[alive[units]]
+            unit_cells = cells[units]
+
+            if len(encryptors):
+                owners, positions = _expand(shield_starts, shield_counts, unit_cells)
+                shielded_units, shielding = units[owners], shield_encryptors[positions]
+                fresh = ~shielded[shielded_units, shielding]
+                fresh &= firewall_alive[(shielded_units // width) * firewall_count + shield_firewalls[positions]]
+                np.add.at(health, shielded_units[fresh], shield_amounts[positions[fresh]])
+                shielded[shielded_units[fresh], shielding[fresh]] = True
+
+            # Every defending attacker picks the unit in range with the lowest (distance, health, y, x) key
+            owners, positions = _expand(cover_starts, cover_counts, unit_cells)
+            targeted = units[owners]
+            attackers = (targeted // width) * firewall_count + cover_firewalls[positions]
+            in_play = firewall_alive[attackers]
+            targeted, attackers, positions = targeted[in_play], attackers[in_play], positions[in_play]
+            target_cells = cells[targeted]
+            chosen = _group_winners(attackers, len(firewall_alive), [cover_distances[positions], health[targeted],
+                                                                     y_keys[target_cells], x_keys[target_cells]])
+            unit_damage = (targeted[chosen], damage_i[cover_firewalls[positions[chosen]]])
+
+            # Every unit picks the firewall in range with the lowest (distance, health, y, x) key
+            for type_index, unit_stats in enumerate(type_stats):
+                if unit_stats.damage_f <= 0:
+                    continue
+                shooters = units[types[units] == type_index]
+                if not len(shooters):
+                    continue
+                # Units of one type stacked on one location pick the same firewall, so each stack picks once
+                stacks, stack_of = np.unique((shooters // width) * CELL_COUNT + cells[shooters], return_inverse=True)
+                starts, counts, firewalls, distances, firewall_y_keys, firewall_x_keys = self._get_target_table(unit_stats.attackRange)
+                owners, positions = _expand(starts, counts, stacks % CELL_COUNT)
+                targets = (stacks[owners] // CELL_COUNT) * firewall_count + firewalls[positions]
+                in_play = firewall_alive[targets]
+                owners, targets, positions = owners[in_play], targets[in_play], positions[in_play]
+                chosen = _group_winners(owners, len(stacks), [distances[positions], firewall_health[targets],
+                                                              firewall_y_keys[positions], firewall_x_keys[positions]])
+                stack_targets = np.full(len(stacks), -1, dtype=np.int64)
+                stack_targets[owners[chosen]] = targets[chosen]
+                hits = stack_targets[stack_of]
+                hits = hits[hits >= 0]
+                hit_firewalls.append(hits)
+                hit_damages.append(np.full(len(hits), float(unit_stats.damage_f)))
+
+            np.subtract.at(health, unit_damage[0], unit_damage[1])
+            if hit_firewalls:
+                hit_firewalls = np.concatenate(hit_firewalls)
+                totals = np.bincount(hit_firewalls, weights=np.concatenate(hit_damages), minlength=len(firewall_health))
+                hit = np.flatnonzero(totals)
+                remaining = firewall_health[hit]
+                damage_dealt += np.bincount(hit // max(firewall_count, 1), weights=np.minimum(totals[hit], np.maximum(remaining, 0)),
+                                            minlength=candidate_count)
+                firewall_health[hit] = remaining - totals[hit]
+                killed = hit[firewall_alive[hit] & (firewall_health[hit] <= 0)]
+                firewall_alive[killed] = False
+                if self._reroute:
+                    for target in killed.tolist():
+                        candidate, firewall = divmod(target, firewall_count)
+                        previous_set = candidate_sets[candidate]
+                        destroyed = destroyed_sets[previous_set] | {firewall}
+                        field_set = field_set_indices.get(destroyed)
+                        if field_set is None:
+                            field_set = field_set_indices[destroyed] = len(field_sets)
+                            destroyed_sets.append(destroyed)
+                            location = [CELL_X[self._firewall_cells[firewall]], CELL_Y[self._firewall_cells[firewall]]]
+                            fields = [field.copy() for field in field_sets[previous_set]]
+                            for field in fields:
+                                field.set_blocked(location, False)
+                            field_sets.append(fields)
+                            if field_set == len(next_moves):
+                                next_moves = np.concatenate([next_moves, np.empty_like(next_moves)])
+                            next_moves[field_set] = -1
+                        candidate_sets[candidate] = field_set
+            alive[units[health[units] <= 0]] = False
+
+            counts = np.bincount(np.flatnonzero(alive) // width, minlength=candidate_count)
+            frame_counts[(live_counts > 0) & (counts == 0)] = frame
+            live_counts = counts
+        frame_counts[live_counts > 0] = frame
+        return BatchResult(array('i', breaches.tolist()), array('d', damage_dealt.tolist()), array('i', frame_counts.tolist()))
+
+    def _run_serial(self, plans, max_frames):
+        game_state = self.game_state
+        config = self.config
+        candidate_count = len(plans)
+        firewall_count = len(self._firewall_cells)
+        firewall_at = self._firewall_at
+        firewall_stats = self._firewall_stats
+        firewall_players = self._firewall_players
+        attack_cover = self._attack_cover
+        shield_cover = self._shield_cover
+        hit_radius = self._hit_radius
+        defender = 1 - self.player_index
+        lowest_y = defender == 0
+
+        width = max([len(plan) for plan in plans] + [1])
+        cells = array('i', [0]) * (candidate_count * width)
+        health = array('d', [0]) * (candidate_count * width)
+        progress = array('d', [0]) * (candidate_count * width)
+        steps = array('i', [0]) * (candidate_count * width)
+        directions = bytearray(candidate_count * width)
+        edges = bytearray(candidate_count * width)
+        stats = [None] * (candidate_count * width)
+        shielded = [None] * (candidate_count * width)
+        firewall_health = self._firewall_health * candidate_count
+        firewall_alive = bytearray([1]) * (candidate_count * firewall_count)
+
+        breaches = array('i', [0]) * candidate_count
+        damage_dealt = array('d', [0]) * candidate_count
+        frame_counts = array('i', [0]) * candidate_count
+        shared_fields = {}
+        fields = []
+        active = []
+        for candidate, plan in enumerate(plans):
+            units = []
+            for unit_type, x, y in plan:
+                index = location_to_index([x, y])
+                if index is None or firewall_at[index] != -1:
+                    continue
+                unit = candidate * width + len(units)
+                unit_stats = get_unit_stats(config, unit_type)
+                cells[unit] = index
+                health[unit] = unit_stats.max_health
+                edges[unit] = game_state.get_target_edge([x, y])
+                stats[unit] = unit_stats
+                shielded[unit] = set()
+                units.append(unit)
+                if edges[unit] not in shared_fields:
+                    shared_fields[edges[unit]] = game_state.get_navigation_field(edges[unit])
+            fields.append(shared_fields)
+            active.append(units)
+
+        frame = 0
+        live = [candidate for candidate in range(candidate_count) if active[candidate]]
+        while live and frame < max_frames:
+            frame += 1
+            for candidate in live:
+                units = active[candidate]
+                candidate_fields = fields[candidate]
+                offset = candidate * firewall_count
+                dead = []
+                hits = []
+
+                for unit in units:
+                    unit_progress = progress[unit] + stats[unit].speed
+                    if unit_progress < 1:
+                        progress[unit] = unit_progress
+                        continue
+                    progress[unit] = unit_progress - 1
+                    field = candidate_fields[edges[unit]]
+                    current = cells[unit]
+                    if field.pathlength[current] == 0:
+                        dead.append(unit)
+                        unit_stats = stats[unit]
+                        if steps[unit] < unit_stats.self_destruct_steps or unit_stats.self_destruct_damage_f <= 0:
+                            continue
+                        for cell in _get_disk(current, unit_stats.self_destruct_range, hit_radius):
+                            firewall = firewall_at[cell]
+                            if firewall != -1 and firewall_players[firewall] == defender and firewall_alive[offset + firewall]:
+                                hits.append((firewall, unit_stats.self_destruct_damage_f))
+                        continue
+                    next_move = field._choose_next_move(current, directions[unit], field.direction)
+                    directions[unit] = _VERTICAL if CELL_X[current] == CELL_X[next_move] else _HORIZONTAL
+                    cells[unit] = next_move
+                    steps[unit] += 1
+                    if EDGE_OF[next_move] == edges[unit]:
+                        breaches[candidate] += 1
+                        dead.append(unit)
+                if dead:
+                    units = [unit for unit in units if unit not in dead]
+
+                for unit in units:
+                    for firewall, amount in shield_cover.get(cells[unit], ()):
+                        if firewall_alive[offset + firewall] and firewall not in shielded[unit]:
+                            shielded[unit].add(firewall)
+                            health[unit] += amount
+
+                # Every defending attacker picks the unit in range with the lowest (distance, health, y, x) key
+                targets = {}
+                for unit in units:
+                    cell = cells[unit]
+                    cover = attack_cover.get(cell)
+                    if cover is None:
+                        continue
+                    key = (health[unit], CELL_Y[cell] if lowest_y else -CELL_Y[cell], -abs(HALF_ARENA - 0.5 - CELL_X[cell]))
+                    for firewall, distance in cover:
+                        if not firewall_alive[offset + firewall]:
+                            continue
+                        best = targets.get(firewall)
+                        if best is None or (distance,) + key < best[0]:
+                            targets[firewall] = ((distance,) + key, unit)
+                # Units stacked on one location with the same range pick the same firewall
+                chosen = {}
+                for unit in units:
+                    unit_stats = stats[unit]
+                    if unit_stats.damage_f <= 0:
+                        continue
+                    search = (cells[unit], unit_stats.attackRange)
+                    target = chosen.get(search, -1)
+                    if target == -1:
+                        target = None
+                        target_key = None
+                        for firewall, distance, y_key, x_key in self._get_firewall_targets(search[0], search[1]):
+                            if not firewall_alive[offset + firewall]:
+                                continue
+                            key = (distance, firewall_health[offset + firewall], y_key, x_key)
+                            if target is None or key < target_key:
+                                target = firewall
+                                target_key = key
+                        chosen[search] = target
+                    if target is not None:
+                        hits.append((target, unit_stats.damage_f))
+                for firewall, (_, unit) in targets.items():
+                    health[unit] -= firewall_stats[firewall].damage_i
+                for firewall, damage in hits:
+                    remaining = firewall_health[offset + firewall]
+                    damage_dealt[candidate] += min(damage, max(remaining, 0))
+                    firewall_health[offset + firewall] = remaining - damage
+
+                units = [unit for unit in units if health[unit] > 0]
+                for firewall, _ in hits:
+                    if firewall_alive[offset + firewall] and firewall_health[offset + firewall] <= 0:
+                        firewall_alive[offset + firewall] = 0
+                        if self._reroute:
+                            if candidate_fields is shared_fields:
+                                candidate_fields = fields[candidate] = {edge: field.copy() for edge, field in shared_fields.items()}
+                            location = [CELL_X[self._firewall_cells[firewall]], CELL_Y[self._firewall_cells[firewall]]]
+                            for field in candidate_fields.values():
+                                field.set_blocked(location, False)
+                active[candidate] = units
+                if not units:
+                    frame_counts[candidate] = frame
+            live = [candidate for candidate in live if active[candidate]]
+        for candidate in live:
+            frame_counts[candidate] = frame
+        return BatchResult(breaches, damage_dealt, frame_counts)
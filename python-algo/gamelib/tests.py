@@ -1,7 +1,22 @@
 import unittest
+import io
 import json
+import os
+import tempfile
+import threading
+from unittest import mock
 from .game_state import GameState
-from .unit import GameUnit
+from . import unit as unit_module
+from .unit import GameUnit, get_unit_stats
+from .util import ParsedMessage, parse_message, get_message_type, has_events
+from .algocore import AlgoCore, _MessageQueue, _Precomputer
+from .evaluator import EvaluationPool
+from .events import EventDecoder
+from .scheduler import TurnScheduler, get_turn_budget
+from .simulator import ActionSimulator, BatchSimulator
+from .fidelity import check_replay
+from .navigation import NavigationField, get_blocked_grid
+from .geometry import CELL_COUNT
 
 class BasicTests(unittest.TestCase):
 
@@ -132,6 +147,41 @@ class BasicTests(unittest.TestCase):
         state.suppress_warnings(True)
         return state
 
+    def make_empty_map(self):
+        config = """
+        {
+            "unitInformation":[
+                {"cost1":0.5, "getHitRadius":0.01, "display":"Filter", "shorthand":"FF", "startHealth":6.0, "unitCategory":0,
+                 "upgrade":{"cost1":1.5, "startHealth":120.0}},
+                {"cost1":4.0, "getHitRadius":0.01, "shieldPerUnit":2.0, "display":"Encryptor", "shieldRange":3.5, "shorthand":"EF",
+                 "startHealth":30.0, "unitCategory":0, "shieldBonusPerY":0.25, "upgrade":{"shieldRange":7, "shieldPerUnit":3}},
+                {"attackDamageWalker":16.0, "cost1":6.0, "getHitRadius":0.01, "display":"Destructor", "attackRange":3.5, "shorthand":"DF",
+                 "startHealth":75.0, "unitCategory":0, "upgrade":{"attackDamageWalker":32.0}},
+                {"attackDamageTower":2.0, "attackDamageWalker":2.0, "playerBreachDamage":1.0, "cost2":1.0, "getHitRadius":0.01,
+                 "display":"Ping", "attackRange":3.5, "shorthand":"PI", "startHealth":15.0, "speed":1, "unitCategory":1,
+                 "selfDestructDamageWalker":15.0, "selfDestructDamageTower":15.0, "selfDestructRange":1.5, "selfDestructStepsRequired":5},
+                {"attackDamageWalker":8.0, "attackDamageTower":8.0, "playerBreachDamage":1.0, "cost2":3.0, "getHitRadius":0.01,
+                 "display":"EMP", "attackRange":4.5, "shorthand":"EI", "startHealth":5.0, "speed":0.5, "unitCategory":1,
+                 "selfDestructDamageWalker":5.0, "selfDestructDamageTower":5.0, "selfDestructRange":1.5, "selfDestructStepsRequired":5},
+                {"attackDamageWalker":20.0, "playerBreachDamage":1.0, "cost2":1.0, "getHitRadius":0.01, "display":"Scrambler",
+                 "attackRange":4.5, "shorthand":"SI", "startHealth":40.0, "speed":0.25, "unitCategory":1,
+                 "selfDestructDamageWalker":40.0, "selfDestructDamageTower":0.0, "selfDestructRange":6, "selfDestructStepsRequired":0},
+                {"display":"Remove", "shorthand":"RM"},
+                {"display":"Upgrade", "shorthand":"UP"}
+            ],
+            "timingAndReplay":{"waitTimeBotMax":35000, "waitTimeBotSoft":5000, "replaySave":1},
+            "resources":{
+                "turnIntervalForBitSchedule":10, "bitGrowthRate":1.0, "startingHP":30.0, "bitsPerRound":5.0,
+                "coresPerRound":5.0, "coresForPlayerDamage":1.0, "startingBits":5.0, "bitDecayPerRound":0.25, "startingCores":40.0
+            }
+        }
+        """
+        turn_0 = """{"p2Units":[[],[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,40.0,5.0,0],"p1Units":[[],[],[],[],[],[],[],[]],"p2Stats":[30.0,40.0,5.0,0],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
+
+        state = GameState(json.loads(config), turn_0)
+        state.suppress_warnings(True)
+        return state
+
     def test_basic(self):
         self.assertEqual(True, True, "It's the end of the world as we know it, and I feel fine")
 
@@ -232,3 +282,478 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_bits(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} bits {} turns from now, got {}".format(expected, turns, actual))
 
+    def test_find_path_to_edge(self):
+        game = self.make_empty_map()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([13, 0], path[0], "Paths should start at the starting location")
+        self.assertEqual([27, 14], path[-1], "Unit should reach the top right edge")
+        self.assertEqual(29, len(path), "Unit should take the shortest path on an empty board")
+
+        for x in range(5, 23):
+            game.game_map.add_unit("FF", [x, 10])
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([[22, 9], [23, 9], [23, 10]], path[18:21], "Unit should walk around the wall")
+        self.assertEqual([27, 14], path[-1], "Unit should still reach the top right edge")
+
+        for x in range(28):
+            if game.game_map.in_arena_bounds([x, 8]):
+                game.game_map.add_unit("FF", [x, 8])
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([21, 7], path[-1], "Unit should self destruct at the most ideal reachable location")
+        self.assertEqual(None, game.find_path_to_edge([13, 8]), "Pathing from a blocked location should fail")
+
+    def test_navigation_field_cache(self):
+        game = self.make_empty_map()
+        field = game.get_navigation_field(game.game_map.TOP_RIGHT)
+        self.assertIs(field, game.get_navigation_field(game.game_map.TOP_RIGHT), "Fields should be reused while the map is unchanged")
+        self.assertEqual(29, len(game.find_path_to_edge([13, 0])), "Unit should take the shortest path on an empty board")
+
+        game.attempt_spawn("FF", [[13, 1], [14, 1]])
+        self.assertIs(field, game.get_navigation_field(game.game_map.TOP_RIGHT), "A single change should repair the field in place")
+        self.assertEqual(1, field.blocked[1 * 28 + 13], "Spawning a firewall should update the field")
+        self.assertEqual([[13, 0], [14, 0]], game.find_path_to_edge([13, 0]), "Unit should self destruct inside the closed pocket")
+
+        game.game_map.remove_unit([14, 1])
+        self.assertEqual([[13, 0], [14, 0], [14, 1]], game.find_path_to_edge([13, 0])[:3], "Removing a firewall should reopen the path")
+
+    def test_navigation_field_repair(self):
+        game = self.make_empty_map()
+        end_points = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+        field = NavigationField(get_blocked_grid(game.game_map), end_points)
+        wall = [[x, 8] for x in range(28) if game.game_map.in_arena_bounds([x, 8])]
+        for location in wall + [[13, 4], [13, 8]]:
+            blocked = not game.contains_stationary_unit(location)
+            if blocked:
+                game.game_map.add_unit("FF", location)
+            else:
+                game.game_map.remove_unit(location)
+            field.set_blocked(location, blocked)
+            rebuilt = NavigationField(get_blocked_grid(game.game_map), end_points)
+            self.assertEqual(rebuilt.pathlength, field.pathlength, "Repairing the field at {} should match rebuilding it".format(location))
+            self.assertEqual(rebuilt.get_path([13, 0]), field.get_path([13, 0]), "Repaired field gives a different path")
+
+    def test_path_trace(self):
+        game = self.make_empty_map()
+        game.game_map.add_unit("DF", [24, 14], 1)
+        ping = game.get_path_trace([13, 0], "PI")
+        emp = game.get_path_trace([13, 0], "EI")
+        self.assertEqual(game.find_path_to_edge([13, 0]), ping.path, "Traces should follow the same path as find_path_to_edge")
+        self.assertEqual(list(range(29)), ping.enter_frames, "Pings move one location every frame")
+        self.assertEqual(28, ping.leave_frames[-1], "Units score on the frame they reach the edge")
+        self.assertEqual(56, emp.leave_frames[-1], "EMPs move every other frame")
+        self.assertEqual(2 * ping.exposure[(24, 14)], emp.exposure[(24, 14)], "EMPs should spend twice as long in range of the destructor")
+        self.assertEqual(16 * ping.exposure[(24, 14)], ping.damage, "The destructor deals its damage every frame we are in range")
+        self.assertEqual(None, game.get_path_trace([13, 0], "FF"), "Firewalls do not move")
+
+        game.attempt_spawn("FF", [[x, 8] for x in range(28) if game.game_map.in_arena_bounds([x, 8])])
+        ping = game.get_path_trace([13, 0], "PI")
+        self.assertEqual(ping.enter_frames[-1] + 1, ping.leave_frames[-1], "Units self destruct on their next move")
+
+    def test_map_geometry(self):
+        game = self.make_empty_map()
+        locations = list(game.game_map)
+        self.assertEqual(len(locations), 420, "The arena should have 420 locations")
+        self.assertEqual(locations[0], [13, 0], "Iteration should start at the bottom corner")
+        self.assertEqual(locations[-1], [14, 27], "Iteration should end at the top corner")
+        self.assertEqual(game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)[0], [13, 0], "Bottom left edge should start at the center")
+        self.assertTrue(game.game_map.in_arena_bounds([0, 13]), "[0, 13] is in bounds")
+        self.assertFalse(game.game_map.in_arena_bounds([0, 12]), "[0, 12] is out of bounds")
+        self.assertTrue(game.can_spawn("PI", [0, 13]), "[0, 13] is on the bottom left edge")
+        self.assertFalse(game.can_spawn("PI", [1, 13]), "[1, 13] is not on an edge")
+
+    def test_compact_map(self):
+        game = self.make_empty_map()
+        compact = GameState(game.config, game.serialized_string, compact_map=True)
+        compact.suppress_warnings(True)
+        for state in [game, compact]:
+            state.game_map.add_unit("DF", [13, 12], 0, 40.0)
+            state.game_map.upgrade_unit([13, 12])
+            state.game_map.set_pending_removal([13, 12])
+            state.game_map.add_unit("PI", [13, 0], 1)
+            state.game_map.add_unit("PI", [13, 0], 1)
+        self.assertEqual(str(game.game_map[13, 12]), str(compact.game_map[13, 12]), "Both maps should hold the same upgraded destructor")
+        self.assertEqual(2, len(compact.game_map[13, 0]), "Information units should stack on a compact map")
+        self.assertEqual(game.find_path_to_edge([14, 0]), compact.find_path_to_edge([14, 0]), "Both maps should path the same way")
+        snapshot = compact.game_map.copy()
+        snapshot.remove_unit([13, 12])
+        self.assertEqual(1, len(compact.game_map[13, 12]), "Changing a copy should not change the original map")
+        self.assertEqual(0, len(snapshot[13, 12]), "The unit should be removed from the copy")
+
+    def test_fork(self):
+        game = self.make_empty_map()
+        game.attempt_spawn("DF", [13, 3])
+        path = game.find_path_to_edge([13, 0])
+        fork = game.fork()
+        fork.attempt_spawn("FF", [[x, 8] for x in range(28) if fork.game_map.in_arena_bounds([x, 8])])
+        fork.game_map[13, 3][0].health = 1
+        self.assertEqual(path, game.find_path_to_edge([13, 0]), "Changing a fork should not change the original path")
+        self.assertEqual(75, game.game_map[13, 3][0].health, "Changing a fork's unit should not change the original unit")
+        self.assertEqual(1, len(game._build_stack), "The fork should have its own build stack")
+        self.assertLess(fork.get_resource(game.CORES), game.get_resource(game.CORES), "The fork should have its own resources")
+        self.assertFalse(fork.can_reach_edge([13, 0]), "The fork's wall should cut us off from the edge")
+        self.assertEqual(fork.find_path_to_edge([13, 0]), fork.get_navigation_field(fork.game_map.TOP_RIGHT).get_path([13, 0]), "The fork should keep its own pathing up to date")
+
+        destructor = game.game_map[13, 3][0]
+        fork = game.fork()
+        self.assertIs(destructor, game.game_map[13, 3][0], "Forking should not replace the original map's units")
+        destructor.health = 50
+        self.assertEqual(50, game.game_map[13, 3][0].health, "Held units should still change the original map")
+        fork.game_map.upgrade_unit([13, 3])
+        self.assertFalse(destructor.upgraded, "Upgrading the fork's unit should not upgrade the original")
+        game.game_map.add_unit("PI", [13, 3], 1)
+        self.assertEqual(1, len(fork.game_map[13, 3]), "Adding to the original should not add to the fork")
+        game.game_map.remove_unit([13, 3])
+        game.game_map.add_unit("DF", [13, 3])
+
+        fork = game.fork()
+        fork.game_map.add_unit("DF", [14, 4])
+        threat_map = fork.get_threat_map()
+        self.assertEqual(32, threat_map.walker_damage[0][4 * 28 + 13], "Both destructors should threaten the location between them")
+        self.assertEqual(CELL_COUNT - 1, sum(fork.game_map._GameMap__shared), "Building the threat map should not copy shared locations")
+        compact = GameState(game.config, game.serialized_string, compact_map=True)
+        compact.game_map.add_unit("DF", [13, 3])
+        compact.game_map.add_unit("DF", [14, 4])
+        self.assertEqual(threat_map.walker_damage, compact.get_threat_map().walker_damage, "Compact maps should measure the same threat")
+
+    def test_checkpoint_rollback(self):
+        game = self.make_empty_map()
+        game.attempt_spawn("DF", [13, 3])
+        path = game.find_path_to_edge([13, 0])
+        cores = game.get_resource(game.CORES)
+        checkpoint = game.checkpoint()
+        game.attempt_spawn("FF", [[x, 8] for x in range(28) if game.game_map.in_arena_bounds([x, 8])])
+        game.attempt_upgrade([13, 3])
+        game.attempt_spawn("PI", [13, 0], 3)
+        self.assertNotEqual(path, game.find_path_to_edge([13, 0]), "The wall should change our path")
+        game.rollback(checkpoint)
+        self.assertEqual(path, game.find_path_to_edge([13, 0]), "Rolling back should restore our path")
+        self.assertEqual(cores, game.get_resource(game.CORES), "Rolling back should refund our cores")
+        self.assertFalse(game.game_map[13, 3][0].upgraded, "Rolling back should undo the upgrade")
+        self.assertEqual(0, len(game.game_map[13, 0]), "Rolling back should remove our pings")
+        self.assertEqual(1, len(game._build_stack), "Rolling back should only keep the first spawn command")
+        self.assertEqual(0, len(game._deploy_stack), "Rolling back should drop the ping spawn command")
+
+    def test_zobrist_hash(self):
+        game = self.make_empty_map()
+        empty_hash = game.get_zobrist_hash()
+        game.attempt_spawn("DF", [13, 3])
+        self.assertNotEqual(empty_hash, game.get_zobrist_hash(), "Adding a unit should change the hash")
+        spawned_hash = game.get_zobrist_hash()
+        game.attempt_upgrade([13, 3])
+        self.assertNotEqual(spawned_hash, game.get_zobrist_hash(), "Upgrading a unit should change the hash")
+        game.game_map.add_unit("PI", [13, 0])
+        game.game_map.add_unit("PI", [13, 0])
+        compact = GameState(game.config, game.serialized_string, compact_map=True)
+        compact.game_map.add_unit("PI", [13, 0])
+        compact.game_map.add_unit("DF", [13, 3])
+        compact.game_map.add_unit("PI", [13, 0])
+        compact.game_map.upgrade_unit([13, 3])
+        self.assertEqual(game.get_zobrist_hash(), compact.get_zobrist_hash(), "The same units should hash the same in any order")
+        game.game_map.remove_unit([13, 0])
+        game.game_map.remove_unit([13, 3])
+        self.assertEqual(empty_hash, game.get_zobrist_hash(), "Removing every unit should restore the empty hash")
+
+    def test_unit_stats(self):
+        game = self.make_empty_map()
+        game.game_map.add_unit("DF", [13, 3])
+        game.game_map.add_unit("DF", [14, 3])
+        first, second = game.game_map[13, 3][0], game.game_map[14, 3][0]
+        self.assertIs(first.stats, second.stats, "Units of the same type should share their stats")
+        game.game_map.upgrade_unit([13, 3])
+        self.assertEqual(32, first.damage_i, "Upgrading should switch to the upgraded stats")
+        self.assertEqual(16, second.damage_i, "Upgrading one unit should not change the others")
+        self.assertEqual([6, 0], second.cost, "Costs should be read from the config")
+        with self.assertRaises(AttributeError):
+            first.damage_i = 0
+
+        configs = [json.loads(json.dumps(game.config)) for _ in range(20)]
+        self.assertIs(second.stats, get_unit_stats(configs[-1], "DF"), "Equal configs should share their stats")
+        for config in configs:
+            get_unit_stats(config, "DF")
+        self.assertLessEqual(len(unit_module._STATS_TABLES), unit_module._MAX_STATS_TABLES, "Old configs should be evicted")
+        config = json.loads(json.dumps(game.config))
+        config["unitInformation"][2]["attackDamageWalker"] = 20.0
+        self.assertEqual(20, get_unit_stats(config, "DF").damage_i, "Different configs should have their own stats")
+
+    def test_parsed_message(self):
+        game = self.make_empty_map()
+        message = ParsedMessage(game.serialized_string)
+        self.assertIs(parse_message(message), parse_message(message), "A message should only be parsed once")
+        from_message = GameState(game.config, message)
+        from_dict = GameState(game.config, json.loads(game.serialized_string))
+        self.assertEqual(game.turn_number, from_message.turn_number, "GameState should read parsed messages")
+        self.assertEqual(game.get_resource(game.CORES), from_dict.get_resource(game.CORES), "GameState should read parsed dicts")
+        self.assertEqual(json.loads(game.serialized_string), json.loads(message), "A parsed message is still a string")
+
+    def test_message_classification(self):
+        game = self.make_empty_map()
+        frame = json.loads(game.serialized_string)
+        frame["turnInfo"] = [1, 0, 4]
+        frame["events"]["breach"] = [[[3, 10], 1, 3, "1", 2]]
+        frame = json.dumps(frame)
+        self.assertEqual(0, get_message_type(game.serialized_string), "Turn messages have type 0")
+        self.assertEqual(1, get_message_type(frame), "Action frames have type 1")
+        self.assertIsNone(get_message_type(json.dumps(game.config)), "The config has no turnInfo")
+        self.assertTrue(has_events(frame, "breach"), "The frame holds a breach")
+        self.assertFalse(has_events(frame, "death"), "The frame holds no deaths")
+
+    def test_event_decoder(self):
+        game = self.make_empty_map()
+        decoder = EventDecoder(game.config)
+        frame = json.loads(game.serialized_string)
+        frame["turnInfo"] = [1, 3, 7]
+        frame["events"]["breach"] = [[[3, 10], 1, 3, "1", 2], [[24, 10], 1, 3, "2", 1], [[3, 10], 2, 3, "3", 2]]
+        frame["events"]["death"] = [[[13, 13], 0, "4", 1, False], [[14, 13], 0, "5", 1, True]]
+        decoder.decode(json.dumps(frame))
+        unit_type = game.config["unitInformation"][3]["shorthand"]
+        self.assertEqual(3, len(decoder.breaches), "Every breach should be decoded")
+        self.assertEqual(([3, 10], 1, unit_type), (decoder.breaches[0].location, decoder.breaches[0].player_index, decoder.breaches[0].unit_type), "Player 2 in the frame is player_index 1")
+        self.assertEqual(2, decoder.breach_count[1][10 * 28 + 3], "Both enemy breaches should be counted at [3, 10]")
+        self.assertEqual(3, decoder.breach_damage[1][10 * 28 + 3], "Breach damage should add up")
+        self.assertEqual(1, decoder.breach_count[0][10 * 28 + 24], "Our breach is counted for player_index 0")
+        self.assertEqual({game.config["unitInformation"][0]["shorthand"]: 1}, decoder.units_lost[0], "Removed units are not lost")
+
+        frame["turnInfo"] = [1, 3, 8]
+        frame["events"]["breach"] = []
+        decoder.decode(frame)
+        self.assertEqual(0, len(decoder.breaches), "Buffers hold the last frame only")
+        self.assertEqual(2, decoder.breach_count[1][10 * 28 + 3], "Totals are kept for the rest of the turn")
+        frame["turnInfo"] = [1, 4, 0]
+        decoder.decode(frame)
+        self.assertEqual(0, decoder.breach_count[1][10 * 28 + 3], "Totals are reset on a new turn")
+
+    def test_message_queue(self):
+        for frame_policy, expected in (("drop", ["turn", "frame 1"]), ("coalesce", ["turn", "frame 3"])):
+            messages = _MessageQueue(2, frame_policy)
+            messages.put(0, "turn")
+            for frame in ("frame 1", "frame 2", "frame 3"):
+                messages.put(1, frame)
+            self.assertEqual(2, messages.skipped_frames, "Two frames should not fit in the queue")
+            self.assertEqual(expected, [messages.get()[1] for _ in range(2)], "The {} policy keeps the wrong frames".format(frame_policy))
+            self.assertEqual(0, len(messages), "Every message should have been read")
+
+        messages = _MessageQueue(1, "coalesce")
+        messages.put(1, "breach frame")
+        messages.put(1, "precomputed frame", wanted=False)
+        self.assertEqual((1, "breach frame"), messages.get(), "A frame only precompute_next_turn wants should not replace a wanted one")
+
+    def test_reader_thread_keeps_wanted_frames(self):
+        class BreachRecorder(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.breaches = []
+
+            def on_action_frame(self, turn_string):
+                self.breaches.extend(parse_message(turn_string)["events"]["breach"])
+
+        algo = BreachRecorder()
+        algo.subscribe_action_frames(["breach"])
+        breach_frame = '{"turnInfo":[1,1,3],"events":{"breach":[[[13,27],1.0,3,"5",1]],"death":[]}}'
+        empty_frame = '{"turnInfo":[1,1,4],"events":{"breach":[],"death":[]}}'
+        end = '{"turnInfo":[2,1,5],"events":{}}'
+        messages = _MessageQueue(1, "coalesce")
+        with mock.patch("sys.stdin", io.StringIO("\n".join([breach_frame, empty_frame, end]) + "\n")):
+            reader = threading.Thread(target=algo._AlgoCore__read_messages, args=(messages,), daemon=True)
+            reader.start()
+            reader.join(timeout=1)
+            while True:
+                message_type, message = messages.get()
+                if not algo._handle_message(message_type, message):
+                    break
+        self.assertEqual(1, len(algo.breaches), "The empty frame should not coalesce over the breach frame")
+
+    def test_precomputer(self):
+        game = self.make_empty_map()
+        precomputer = _Precomputer(game.config, lambda game_state: game_state.turn_number)
+        precomputer.submit(game.serialized_string)
+        self.assertEqual(0, precomputer.result(game.get_zobrist_hash(), timeout=5), "The result should match the same board")
+        game.game_map.add_unit("FF", [13, 13], 0)
+        self.assertIsNone(precomputer.result(game.get_zobrist_hash()), "The result should not match a different board")
+
+    def test_turn_scheduler(self):
+        class Plan:
+            submitted = 0
+            def submit_turn(self):
+                self.submitted += 1
+
+        def improve(scores):
+            for score in scores:
+                yield score, Plan()
+
+        def fail():
+            yield 100, Plan()
+            raise ValueError("a broken step")
+
+        self.assertEqual(5, get_turn_budget({"timingAndReplay": {"waitTimeBotSoft": 5000}}), "The budget is the soft limit in seconds")
+        scheduler = TurnScheduler(5, 0.5)
+        scheduler.add_step(improve([1, 3, 2]))
+        scheduler.add_step(fail())
+        fallback = Plan()
+        submitted = scheduler.run(fallback)
+        self.assertEqual(100, scheduler.best_score, "The best plan should be kept when a step fails")
+        self.assertEqual(1, submitted.submitted, "The best plan should be submitted once")
+        self.assertEqual(0, fallback.submitted, "The fallback plan is only submitted without a better one")
+
+        late = TurnScheduler(1, 0.5, started_at=0)
+        late.add_step(improve([1]))
+        self.assertIs(fallback, late.run(fallback), "No step should run after the deadline")
+        self.assertEqual(0, late.steps_run, "No step should run after the deadline")
+
+    def test_evaluation_pool(self):
+        game = self.make_empty_map()
+        game.game_map.add_unit("DF", [24, 14], 1)
+        game.game_map.add_unit("FF", [14, 0], 0)
+        locations = [[13, 0], [14, 0], [3, 10], [24, 10]]
+        pool = EvaluationPool(2)
+        try:
+            pool.publish(game)
+            evaluations = pool.evaluate_spawn_locations(locations)
+        finally:
+            pool.close()
+        for evaluation, expected in zip(evaluations, game.evaluate_spawn_locations(locations)):
+            if expected is None:
+                self.assertIsNone(evaluation, "Blocked locations should not be evaluated")
+                continue
+            self.assertEqual(expected['path_length'], evaluation.path_length, "Workers should path like GameState")
+            self.assertEqual(expected['damage'], evaluation.damage, "Workers should read the same threat as GameState")
+            self.assertEqual(expected['path'][-1], list(evaluation.end_location), "Workers should path like GameState")
+
+    def test_action_simulator(self):
+        game = self.make_empty_map()
+        game.attempt_spawn("PI", [13, 0], 2)
+        result = ActionSimulator(game).run()
+        self.assertEqual([2, 0], result.breaches, "Both pings should score on an empty board")
+        self.assertEqual(28, result.frame_count, "Pings move one step per frame along the shortest path")
+        self.assertEqual(28, result.game_state.enemy_health, "Every breach should cost the enemy health")
+        self.assertEqual(0, len(result.game_state.game_map[13, 0]), "Information units should be gone at the end of the turn")
+        self.assertEqual(2, len(game.game_map[13, 0]), "Simulating should not change the game state")
+
+        game = self.make_empty_map()
+        game.game_map.add_unit("DF", [13, 14], 1)
+        game.game_map.add_unit("FF", [12, 13], 1, 1.0)
+        simulator = ActionSimulator(game, [("PI", 13, 0)])
+        for location in [[12, 11], [14, 11], [13, 10], [11, 12]]:
+            game.game_map.add_unit("PI", location, 0)
+            simulator.spawn("PI", location, 0)
+        destructor = simulator._stationary[14 * 28 + 13]
+        target = simulator.get_target(destructor)
+        expected = game.get_target(game.game_map[13, 14][0])
+        self.assertEqual([expected.x, expected.y], [target.x, target.y], "Targets should be chosen like GameState.get_target")
+        result = simulator.run()
+        self.assertLess(result.breaches[0], 5, "The destructor should stop some of the pings")
+        self.assertEqual(0, len(result.game_state.game_map[12, 13]), "The pings should destroy the weak filter")
+        self.assertGreater(result.game_state.game_map[13, 14][0].max_health, result.game_state.game_map[13, 14][0].health, "Damage to surviving firewalls should be kept")
+
+    def test_batch_simulator(self):
+        game = self.make_empty_map()
+        for x in range(10, 18):
+            game.game_map.add_unit("DF", [x, 16], 1)
+        game.game_map.add_unit("FF", [13, 18], 1, 4.0)
+        game.game_map.add_unit("EF", [12, 4], 0)
+        plans = [[("PI", 13, 0)] * 8, [("EI", 3, 10)] * 3, [("SI", 24, 10), ("PI", 14, 0)], [], [("PI", 13, 13)]]
+        simulator = BatchSimulator(game)
+        result = simulator.run(plans)
+        serial = simulator._run_serial(plans, 2000)
+        self.assertEqual((list(serial.breaches), list(serial.damage_dealt), list(serial.frame_counts)),
+                         (list(result.breaches), list(result.damage_dealt), list(result.frame_counts)), "Both ways of running a batch should agree")
+        for candidate, plan in enumerate(plans):
+            expected = ActionSimulator(game, plan).run()
+            self.assertEqual(expected.breaches[0], result.breaches[candidate], "Candidate {} should score like ActionSimulator".format(candidate))
+            self.assertEqual(expected.damage_dealt[0], result.damage_dealt[candidate], "Candidate {} should deal the damage of ActionSimulator".format(candidate))
+            self.assertEqual(expected.frame_count, result.frame_counts[candidate], "Candidate {} should last as long as in ActionSimulator".format(candidate))
+        self.assertEqual(0, result.breaches[3], "An empty plan cannot score")
+
+    def test_fidelity(self):
+        game = self.make_empty_map()
+        path = game.find_path_to_edge([13, 0])
+        lines = [json.dumps(game.config), game.serialized_string]
+        for frame_number in range(4):
+            frame = json.loads(game.serialized_string)
+            frame["turnInfo"] = [1, 0, frame_number]
+            if frame_number == 0:
+                frame["events"]["spawn"] = [[[13, 0], 3, "7", 1]]
+            x, y = path[frame_number] if frame_number < 3 else [0, 13]
+            frame["p1Units"][3] = [[x, y, 15.0, "7"]]
+            lines.append(json.dumps(frame))
+        with tempfile.NamedTemporaryFile("w", suffix=".replay", delete=False) as replay:
+            replay.write("\n".join(lines))
+        try:
+            stats = check_replay(replay.name)
+        finally:
+            os.remove(replay.name)
+        self.assertEqual((1, 3), (stats.turns, stats.frames), "Every frame after frame 0 should be compared")
+        self.assertEqual(1, stats.divergences["movement"], "Only the last frame moves the ping somewhere else")
+        self.assertEqual(1, stats.first_divergences["movement"], "Movement should be the first rule broken")
+        self.assertEqual(0, stats.divergences["health"] + stats.divergences["deaths"], "The ping should stay alive with full health")
+        self.assertEqual(0, stats.clean_turns, "The turn diverged")
+
+    def test_can_reach_edge(self):
+        game = self.make_empty_map()
+        self.assertTrue(game.can_reach_edge([13, 0]), "Every location can reach the edge on an empty board")
+        game.attempt_spawn("FF", [[x, 8] for x in range(28) if game.game_map.in_arena_bounds([x, 8])])
+        self.assertFalse(game.can_reach_edge([13, 0]), "The wall should cut us off from the top right edge")
+        self.assertTrue(game.can_reach_edge([13, 0], game.game_map.BOTTOM_RIGHT), "We are standing next to the bottom right edge")
+        self.assertTrue(game.can_reach_edge([13, 9]), "Locations above the wall can still reach the edge")
+        bitboard = game.get_bitboard()
+        self.assertTrue(bitboard.with_blocked([13, 8], False).can_reach_edge([13, 0], game.game_map.TOP_RIGHT), "A gap in the wall should let us through")
+        self.assertFalse(bitboard.can_reach_edge([13, 0], game.game_map.TOP_RIGHT), "with_blocked should not change the original bitboard")
+
+    def test_evaluate_spawn_locations(self):
+        game = self.make_empty_map()
+        evaluations = game.evaluate_spawn_locations([[13, 0], [14, 0]])
+        self.assertEqual(28, evaluations[0]['path_length'], "Unit should take the shortest path on an empty board")
+        self.assertEqual(0, evaluations[0]['damage'], "Nothing is attacking us yet")
+
+        game.game_map.add_unit("DF", [24, 14], 1)
+        game.game_map.add_unit("FF", [14, 0], 0)
+        evaluations = game.evaluate_spawn_locations([[13, 0], [14, 0]])
+        path = evaluations[0]['path']
+        in_range = [location for location in path if game.game_map.distance_between_locations(location, [24, 14]) < 3.5]
+        self.assertEqual(16 * len(in_range), evaluations[0]['damage'], "Every location in range of the destructor should add its damage")
+        self.assertEqual(None, evaluations[1], "Blocked spawn locations cannot be evaluated")
+
+    def test_get_targets(self):
+        game = self.make_empty_map()
+        game.game_map.add_unit("DF", [13, 14], 1)
+        game.game_map.add_unit("EF", [14, 15], 1)
+        game.game_map.add_unit("PI", [13, 16], 1)
+        game.game_map.add_unit("FF", [13, 13], 0)
+        game.game_map.add_unit("FF", [12, 12], 0)
+        game.game_map[12, 12][0].health = 1
+        targets = game.get_targets()
+        destructor = game.game_map[13, 14][0]
+        ping = game.game_map[13, 16][0]
+        self.assertEqual(2, len(targets), "Only the destructor and the ping deal damage")
+        self.assertEqual(None, targets[destructor], "Destructors do not attack firewalls")
+        self.assertIs(game.game_map[13, 13][0], targets[ping], "The ping should attack the nearest firewall")
+
+        game.game_map.add_unit("PI", [11, 13], 0)
+        game.game_map.add_unit("PI", [11, 13], 0)
+        game.game_map[11, 13][1].health = 5
+        targets = game.get_targets()
+        self.assertIs(game.game_map[11, 13][1], targets[destructor], "Information units should be preferred, then the lowest health")
+        for attacker, target in targets.items():
+            self.assertIs(game.get_target(attacker), target, "Bulk targeting should agree with get_target")
+
+    def test_get_attackers(self):
+        game = self.make_empty_map()
+
+        self.assertEqual([], game.get_attackers([13,13], 0), "Are we being attacked by a ghost?")
+        game.game_map.add_unit("DF", [12,12], 0)
+        self.assertEqual([], game.get_attackers([13,13], 0), "Are we being attacked by a friend?")
+        game.game_map.add_unit("EF", [13,12], 1)
+        self.assertEqual([], game.get_attackers([13,13], 0), "Are we being attacked by an encryptor?")
+        game.game_map.add_unit("FF", [14,12], 1)
+        self.assertEqual([], game.get_attackers([13,13], 0), "Are we being attacked by a filter?")
+        game.game_map.add_unit("DF", [12,14], 1)
+        self.assertEqual(1, len(game.get_attackers([13,13], 0)), "We should be in danger")
+        game.game_map.add_unit("DF", [13,14], 1)
+        game.game_map.add_unit("DF", [14,14], 1)
+        self.assertEqual(3, len(game.get_attackers([13,13], 0)), "We should be in danger from 3 places")
+
+        threat_map = game.get_threat_map()
+        self.assertEqual(48, threat_map.walker_damage[1][13 * 28 + 13], "Three destructors should deal 48 damage per frame")
+        game.game_map.upgrade_unit([13,14])
+        game.game_map.remove_unit([14,14])
+        self.assertEqual(2, len(game.get_attackers([13,13], 0)), "Removed attackers should stop threatening us")
+        self.assertEqual(48, threat_map.walker_damage[1][13 * 28 + 13], "The upgraded destructor should deal 32 damage per frame")
@@ -0,0 +1,130 @@
+from .geometry import CELL_COUNT, CELL_X, CELL_Y, location_to_index
+from .game_map import _get_disk
+
+
+class ThreatMap:
+    """Tracks how strongly each player's stationary units threaten every location of the map
+
+    Every stationary unit that can attack stamps its range onto the map once. When stationary units
+    are added, removed or upgraded, only their own stamps are taken back and reapplied,
+    so damage heuristics can read from the arrays instead of scanning the board.
+    Units are read without indexing the map, so measuring a copied map does not copy its locations.
+    All arrays are indexed by [player_index][cell index], where player_index is the player owning the attackers.
+
+    Attributes :
+        * game_map (:obj: GameMap): The map the threat is measured on
+        * attacker_count (list): The number of stationary units able to attack each location
+        * walker_damage (list): The damage per frame information units at each location would take
+        * tower_damage (list): The damage per frame firewalls at each location would take
+
+    """
+    def __init__(self, game_map):
+        """Stamps every stationary unit currently on the map
+
+        Args:
+            game_map: The GameMap to measure
+
+        """
+        self.game_map = game_map
+        self._hit_radius = game_map.config["unitInformation"][0].get('getHitRadius', 0)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.attacker_count = [[0] * CELL_COUNT, [0] * CELL_COUNT]
+        self.walker_damage = [[0] * CELL_COUNT, [0] * CELL_COUNT]
+        self.tower_damage = [[0] * CELL_COUNT, [0] * CELL_COUNT]
+        # Tuples, so copies of the threat map can share them
+        self._attackers = [[()] * CELL_COUNT, [()] * CELL_COUNT]
+        self._stamps = {}
+        self._version = self.game_map.stationary_version
+        for index, blocked in enumerate(self.game_map.get_blocked_grid()):
+            if blocked:
+                self._stamp(index)
+
+    def copy(self, game_map):
+        """Copies the threat map, for a copy of its game map
+
+        Args:
+            game_map: The copy of the game map, holding the same stationary units as this threat map's map
+
+        Returns:
+            A new ThreatMap that updates from game_map
+        """
+        threat_map = ThreatMap.__new__(ThreatMap)
+        threat_map.game_map = game_map
+        threat_map._hit_radius = self._hit_radius
+        threat_map._version = self._version
+        threat_map._stamps = dict(self._stamps)
+        threat_map.attacker_count = [counts[:] for counts in self.attacker_count]
+        threat_map.walker_damage = [damages[:] for damages in self.walker_damage]
+        threat_map.tower_damage = [damages[:] for damages in self.tower_damage]
+        threat_map._attackers = [attackers[:] for attackers in self._attackers]
+        return threat_map
+
+    def update(self):
+        """Brings the threat map up to date with changes made to stationary units on the map
+        """
+        if self._version == self.game_map.stationary_version:
+            return
+        changes = self.game_map.get_stationary_changes(self._version)
+        if changes is None:
+            self._rebuild()
+            return
+        for location in changes:
+            index = location_to_index(location)
+            self._unstamp(index)
+            self._stamp(index)
+        self._version = self.game_map.stationary_version
+
+    def get_attacker_locations(self, location, player_index):
+        """Gets the locations of the given player's stationary units that can attack a location
+
+        Args:
+            location: The location being attacked
+            player_index: The player owning the attackers
+
+        Returns:
+            A list of attacker locations, ordered by x then y
+
+        """
+        index = location_to_index(location)
+        if index is None:
+            return []
+        attackers = sorted(self._attackers[player_index][index], key=lambda attacker: (CELL_X[attacker], CELL_Y[attacker]))
+        return [[CELL_X[attacker], CELL_Y[attacker]] for attacker in attackers]
+
+    def _stamp(self, index):
+        stationary = self.game_map._stationary_stats(index)
+        if stationary is None:
+            return
+        player_index, stats = stationary
+        if stats.damage_i + stats.damage_f <= 0:
+            return
+
+        disk = _get_disk(index, stats.attackRange, self._hit_radius)
+        self._stamps[index] = (player_index, stats.damage_i, stats.damage_f, disk)
+        attacker_count = self.attacker_count[player_index]
+        walker_damage = self.walker_damage[player_index]
+        tower_damage = self.tower_damage[player_index]
+        attackers = self._attackers[player_index]
+        for cell in disk:
+            attacker_count[cell] += 1
+            walker_damage[cell] += stats.damage_i
+            tower_damage[cell] += stats.damage_f
+            attackers[cell] += (index,)
+
+    def _unstamp(self, index):
+        stamp = self._stamps.pop(index, None)
+        if stamp is None:
+            return
+
+        player_index, damage_i, damage_f, disk = stamp
+        attacker_count = self.attacker_count[player_index]
+        walker_damage = self.walker_damage[player_index]
+        tower_damage = self.tower_damage[player_index]
+        attackers = self._attackers[player_index]
+        for cell in disk:
+            attacker_count[cell] -= 1
+            walker_damage[cell] -= damage_i
+            tower_damage[cell] -= damage_f
+            attackers[cell] = tuple(attacker for attacker in attackers[cell] if attacker != index)
@@ -1,3 +1,8 @@
+import functools
+import json
+from collections import OrderedDict, namedtuple
+
+
 def is_stationary(unit_type, firewall_types):
     """
         Args:
@@ -9,9 +14,106 @@ def is_stationary(unit_type, firewall_types):
     return unit_type in firewall_types
 
 
+"""
+The stats every unit of one type and upgrade level shares. They are read from the config once
+and referenced by every GameUnit, instead of being copied into each unit.
+The fields after cost are only read by the action phase simulator, in simulator.py.
+"""
+UnitStats = namedtuple("UnitStats", ["stationary", "speed", "damage_f", "damage_i", "attackRange",
+                                     "shieldRange", "max_health", "shieldPerUnit", "cost",
+                                     "shield_bonus_per_y", "breach_damage", "breach_cores", "refund",
+                                     "self_destruct_damage_f", "self_destruct_damage_i",
+                                     "self_destruct_range", "self_destruct_steps"])
+
+# The stats tables of the configs read most recently, by id(config). The config is kept with its table,
+# so its id can not be reused while the entry exists, and the oldest entries are evicted
+_STATS_TABLES = OrderedDict()
+_MAX_STATS_TABLES = 8
+
+
+def _get_stats_key(config):
+    """
+    A canonical string of the parts of a config the stats are read from, equal for equal configs
+    """
+    resources = config.get("resources", {})
+    mechanics = config.get("mechanics", {})
+    return json.dumps({
+        "unitInformation": config["unitInformation"],
+        "resources": {key: resources[key] for key in ("coresForPlayerDamage",) if key in resources},
+        "mechanics": {key: mechanics[key] for key in ("selfDestructRadius", "stepsRequiredSelfDestruct") if key in mechanics}
+    }, sort_keys=True)
+
+
+@functools.lru_cache(maxsize=_MAX_STATS_TABLES)
+def _build_stats_table(stats_key):
+    config = json.loads(stats_key)
+    table = {}
+    resources = config.get("resources", {})
+    # Older configs keep the self destruct rules in mechanics instead of in each unit type
+    mechanics = config.get("mechanics", {})
+    for type_config in config["unitInformation"]:
+        breach_damage = type_config.get("playerBreachDamage", 0)
+        stats = UnitStats(
+            stationary=type_config.get("unitCategory") == 0,
+            speed=type_config.get("speed", 0),
+            damage_f=type_config.get("attackDamageTower", 0),
+            damage_i=type_config.get("attackDamageWalker", 0),
+            attackRange=type_config.get("attackRange", 0),
+            shieldRange=type_config.get("shieldRange", 0),
+            max_health=type_config.get("startHealth", 0),
+            shieldPerUnit=type_config.get("shieldPerUnit", 0),
+            cost=(type_config.get("cost1", 0), type_config.get("cost2", 0)),
+            shield_bonus_per_y=type_config.get("shieldBonusPerY", 0),
+            breach_damage=breach_damage,
+            breach_cores=type_config.get("metalForBreach", resources.get("coresForPlayerDamage", 0) * breach_damage),
+            refund=type_config.get("refundPercentage", 0),
+            self_destruct_damage_f=type_config.get("selfDestructDamageTower", 0),
+            self_destruct_damage_i=type_config.get("selfDestructDamageWalker", 0),
+            self_destruct_range=type_config.get("selfDestructRange", mechanics.get("selfDestructRadius", 0)),
+            self_destruct_steps=type_config.get("selfDestructStepsRequired", mechanics.get("stepsRequiredSelfDestruct", 0)))
+        upgrade = type_config.get("upgrade", {})
+        upgraded_stats = stats._replace(
+            speed=upgrade.get("speed", stats.speed),
+            damage_f=upgrade.get("attackDamageTower", stats.damage_f),
+            damage_i=upgrade.get("attackDamageWalker", stats.damage_i),
+            attackRange=upgrade.get("attackRange", stats.attackRange),
+            shieldRange=upgrade.get("shieldRange", stats.shieldRange),
+            max_health=upgrade.get("startHealth", stats.max_health),
+            shieldPerUnit=upgrade.get("shieldPerUnit", stats.shieldPerUnit),
+            cost=(upgrade.get("cost1", 0) + stats.cost[0], upgrade.get("cost2", 0) + stats.cost[1]),
+            shield_bonus_per_y=upgrade.get("shieldBonusPerY", stats.shield_bonus_per_y),
+            refund=upgrade.get("refundPercentage", stats.refund))
+        table[type_config.get("shorthand")] = (stats, upgraded_stats)
+    return table
+
+
+def get_unit_stats(config, unit_type, upgraded=False):
+    """Gets the shared stats of a unit type
+
+    Args:
+        * config: The game config
+        * unit_type: The type of the unit
+        * upgraded: True to get the stats of the upgraded unit
+
+    Returns:
+        A UnitStats record
+    """
+    entry = _STATS_TABLES.get(id(config))
+    if entry is None or entry[0] is not config:
+        # Configs with the same unit information, like those of many replays, share one table
+        entry = (config, _build_stats_table(_get_stats_key(config)))
+        _STATS_TABLES[id(config)] = entry
+        if len(_STATS_TABLES) > _MAX_STATS_TABLES:
+            _STATS_TABLES.popitem(last=False)
+    return entry[1][unit_type][1 if upgraded else 0]
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
+    The stats of the unit's type are read from a UnitStats record shared by all units of the same type
+    and upgrade level, so they can not be assigned to.
+
     Attributes :
         * unit_type (string): This unit's type
         * config (JSON): Contains information about the game
@@ -30,8 +132,11 @@ class GameUnit:
         * shieldPerUnit (float): how much shield is given per unit
         * pending_removal (boolean): If this unit is marked for removal by its owner
         * upgraded (boolean): If this unit is upgraded
+        * stats (UnitStats): The stats shared by this unit's type and upgrade level
 
     """
+    __slots__ = ("unit_type", "config", "player_index", "pending_removal", "upgraded", "x", "y", "health", "stats")
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
@@ -43,34 +148,53 @@ class GameUnit:
         self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
-
-    def __serialize_type(self):
-        from .game_state import FIREWALL_TYPES, UNIT_TYPE_TO_INDEX, ENCRYPTOR
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        self.stats = get_unit_stats(config, unit_type)
+        self.health = self.stats.max_health if not health else health
+
+    def __copy__(self):
+        unit = GameUnit.__new__(GameUnit)
+        for name in GameUnit.__slots__:
+            setattr(unit, name, getattr(self, name))
+        return unit
+
+    @property
+    def stationary(self):
+        return self.stats.stationary
+
+    @property
+    def speed(self):
+        return self.stats.speed
+
+    @property
+    def damage_f(self):
+        return self.stats.damage_f
+
+    @property
+    def damage_i(self):
+        return self.stats.damage_i
+
+    @property
+    def attackRange(self):
+        return self.stats.attackRange
+
+    @property
+    def shieldRange(self):
+        return self.stats.shieldRange
+
+    @property
+    def max_health(self):
+        return self.stats.max_health
+
+    @property
+    def shieldPerUnit(self):
+        return self.stats.shieldPerUnit
 
+    @property
+    def cost(self):
+        return list(self.stats.cost)
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
+        self.stats = get_unit_stats(self.config, self.unit_type, True)
         self.upgraded = True
 
 
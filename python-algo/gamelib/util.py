@@ -1,8 +1,13 @@
 import sys
+import json
+import re
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
+_TURN_INFO = re.compile(r'"turnInfo"\s*:\s*\[\s*(\d+)\s*,')
+_EVENT_PATTERNS = {}
+
 
 def get_command():
     """Gets input from stdin
@@ -21,6 +26,76 @@ def get_command():
         exit()
     return ret
 
+class ParsedMessage(str):
+    """A message from the game engine that parses its JSON the first time it is read, and never again
+
+    It is still a string, so code that calls json.loads on the messages given to on_turn and
+    on_action_frame keeps working. Use parse_message to get the parsed message without parsing it again.
+
+    Attributes :
+        * data (dict): The parsed message
+
+    """
+    @property
+    def data(self):
+        data = self.__dict__.get("_data")
+        if data is None:
+            data = self._data = json.loads(self)
+        return data
+
+
+def parse_message(message):
+    """Parses a message from the game engine
+
+    Args:
+        message: A message string, a ParsedMessage or an already parsed dict
+
+    Returns:
+        The parsed message. A ParsedMessage is only parsed once, however many times this is called on it
+
+    """
+    if isinstance(message, ParsedMessage):
+        return message.data
+    if isinstance(message, dict):
+        return message
+    return json.loads(message)
+
+def get_message_type(message):
+    """Finds the type of a message from the game engine without parsing all of it
+
+    Args:
+        message: A message string or ParsedMessage
+
+    Returns:
+        The first value of the message's turnInfo, 0 for a turn, 1 for an action frame and 2 for the end of the game.
+        None if the message has no turnInfo, like the config message
+
+    """
+    match = _TURN_INFO.search(message)
+    if match is not None:
+        return int(match.group(1))
+    if '"turnInfo"' not in message:
+        return None
+    return int(parse_message(message)["turnInfo"][0])
+
+
+def has_events(message, event_type):
+    """Checks if an action frame holds any events of a type, without parsing it
+
+    Args:
+        * message: An action frame message string or ParsedMessage
+        * event_type: The key of the events, like "breach" or "death"
+
+    Returns:
+        True if the frame's list of these events is not empty
+
+    """
+    pattern = _EVENT_PATTERNS.get(event_type)
+    if pattern is None:
+        pattern = _EVENT_PATTERNS[event_type] = re.compile(r'"{}"\s*:\s*\[\s*[^\]\s]'.format(re.escape(event_type)))
+    return pattern.search(message) is not None
+
+
 def send_command(cmd):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'